@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+"""Micro-benchmark of `parse_number` against the legacy number parsing chain."""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textprivacy.utils import (  # noqa: E402
+    is_valid_number,
+    get_integer,
+    get_float,
+    parse_number,
+)
+
+NUMBERS = [
+    "42",
+    "2021",
+    "1.000.000",
+    "1,000,000",
+    "3,14",
+    "3.14",
+    "1.234,56",
+    "1,234.56",
+    "-12,5",
+    "-0.75",
+    "12-34",
+    "1.234.567,891",
+]
+
+
+def legacy(number: str):  # type: ignore
+    validity = is_valid_number(number)
+    if validity == "float":
+        return get_float(number)
+    elif validity == "integer":
+        return get_integer(number)
+    return None
+
+
+def main(repeat: int = 5, number: int = 20000) -> None:
+    for name, function in [("legacy chain", legacy), ("parse_number", parse_number)]:
+        timings = timeit.repeat(
+            lambda: [function(x) for x in NUMBERS], repeat=repeat, number=number
+        )
+        per_number = min(timings) / (number * len(NUMBERS)) * 1e9
+        print(f"{name:>14}: {per_number:8.1f} ns per number")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+"""
+Offline benchmarks of the masking pipeline by stage.
+
+Generates a synthetic Danish corpus, replaces DaCy with a stub spaCy model and reports
+docs/sec and p50/p99 latency of each stage as JSON. Compare with an earlier run to
+catch regressions:
+
+    python benchmarks/run_benchmarks.py --docs 2000 --output new.json --compare old.json
+"""
+
+from typing import Callable, Dict, List, Any, Pattern, Union
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import Document, generate_corpus, make_stub_model  # noqa: E402
+from textprivacy import TextAnonymizer, TextPseudonymizer, NERExecutor  # noqa: E402
+from textprivacy import __version__, models  # noqa: E402
+from textprivacy.detectors import DETECTORS  # noqa: E402
+
+STUB_MODEL = "benchmark-stub"
+STAGES = ["detectors", "mask_entities", "noisy_numbers", "linking", "ner", "pipeline"]
+
+
+def summarize(latencies: List[float], n_docs: int, total: float) -> Dict[str, Any]:
+    """
+    Summarizes the timings of a stage
+
+    Args:
+        latencies: Seconds spent on each unit of work (a text or a batch of texts)
+        n_docs: Number of texts processed
+        total: Seconds spent on the whole stage
+
+    Returns:
+        A dictionary of the throughput and latency percentiles in milliseconds
+
+    """
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "docs": n_docs,
+        "seconds": round(total, 6),
+        "docs_per_sec": round(n_docs / total, 2) if total > 0 else float("inf"),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+    }
+
+
+def time_each(function: Callable[[Any], Any], items: List[Any]) -> Dict[str, Any]:
+    """
+    Times a function on each item
+
+    Args:
+        function: The function to time
+        items: Arguments of each call
+
+    Returns:
+        A summary of the timings
+
+    """
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        tic = time.perf_counter()
+        function(item)
+        latencies.append(time.perf_counter() - tic)
+    return summarize(latencies, len(items), time.perf_counter() - start)
+
+
+def run_stage(
+    stage: str, documents: List[Document], batch_size: int, n_process: int
+) -> Dict[str, Any]:
+    """
+    Benchmarks a stage of the pipeline
+
+    Args:
+        stage: Name of the stage
+        documents: The synthetic corpus
+        batch_size: Batch size for the stub NER model
+        n_process: Number of NER worker processes
+
+    Returns:
+        A summary of the timings
+
+    """
+    texts = [x.text for x in documents]
+    anonymizer = TextAnonymizer(model_size=STUB_MODEL, seed=0)
+    order = ["CPR", "TELEFON", "EMAIL"]
+
+    if stage == "detectors":
+        methods: Dict[str, Union[Callable, Pattern]] = dict(DETECTORS)
+        return time_each(
+            lambda text: anonymizer._detect_entities(text, methods, order), texts
+        )
+
+    if stage == "mask_entities":
+        return time_each(
+            lambda x: anonymizer.mask_entities(x.text, x.entities["PER"], "PER"),
+            documents,
+        )
+
+    if stage == "noisy_numbers":
+        return time_each(
+            lambda x: anonymizer.noisy_numbers(x.text, x.entities["NUM"], 1.0),
+            documents,
+        )
+
+    if stage == "linking":
+        pseudonymizer = TextPseudonymizer(model_size=STUB_MODEL, mask_numbers=True)
+        return time_each(
+            lambda i: pseudonymizer._update_individuals(
+                {k: set(v) for k, v in documents[i].entities.items()}, i
+            ),
+            list(range(len(documents))),
+        )
+
+    if stage == "ner":
+        with NERExecutor(STUB_MODEL, n_process) as executor:
+            executor.start()
+            batches = [
+                texts[i : i + batch_size] for i in range(0, len(texts), batch_size)
+            ]
+            summary = time_each(
+                lambda batch: executor.predict(batch, batch_size, True), batches
+            )
+        summary["docs"] = len(texts)
+        summary["docs_per_sec"] = round(len(texts) / summary["seconds"], 2)
+        summary["latency_unit"] = "batch"
+        return summary
+
+    if stage == "pipeline":
+        with NERExecutor(STUB_MODEL, n_process) as executor:
+            executor.start()
+            pipeline = TextPseudonymizer(
+                model_size=STUB_MODEL, executor=executor, mask_numbers=True
+            )
+            latencies = []
+            start = time.perf_counter()
+            tic = start
+            for _ in pipeline.mask_stream(
+                texts, batch_size=batch_size, n_process=n_process, loglevel="ERROR"
+            ):
+                latencies.append(time.perf_counter() - tic)
+                tic = time.perf_counter()
+            summary = summarize(latencies, len(texts), time.perf_counter() - start)
+        summary["latency_unit"] = "time between texts yielded"
+        return summary
+
+    raise ValueError(f"Unknown stage '{stage}', choose from: {', '.join(STAGES)}")
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    Finds stages whose throughput dropped more than the tolerance below a baseline
+
+    Args:
+        results: Results of this run
+        baseline: Results of an earlier run
+        tolerance: Allowed relative drop in docs/sec
+
+    Returns:
+        A list of descriptions of the regressions
+
+    """
+    regressions = []
+    for stage, summary in results["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before is None:
+            continue
+        if summary["docs_per_sec"] < before["docs_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{stage}: {summary['docs_per_sec']} docs/sec, "
+                f"baseline {before['docs_per_sec']} docs/sec"
+            )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=1000, help="Number of texts")
+    parser.add_argument(
+        "--sentences", type=int, default=10, help="Average sentences per text"
+    )
+    parser.add_argument(
+        "--density", type=float, default=0.5, help="Fraction of sentences with entities"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus")
+    parser.add_argument("--batch-size", type=int, default=32, help="NER batch size")
+    parser.add_argument("--n-process", type=int, default=1, help="NER workers")
+    parser.add_argument(
+        "--stages",
+        type=str,
+        default=",".join(STAGES),
+        help="Comma separated stages to run",
+    )
+    parser.add_argument("--output", type=str, default=None, help="JSON result file")
+    parser.add_argument(
+        "--compare", type=str, default=None, help="JSON results of an earlier run"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative drop in docs/sec compared to --compare",
+    )
+    args = parser.parse_args(argv)
+    # keep per-text warnings, e.g. texts without persons, out of the timings
+    logging.basicConfig(level=logging.ERROR)
+
+    models.register_model(STUB_MODEL, make_stub_model())
+    documents = generate_corpus(args.docs, args.sentences, args.density, args.seed)
+    results: Dict[str, Any] = {
+        "textprivacy": __version__,
+        "python": platform.python_version(),
+        "corpus": {
+            "docs": args.docs,
+            "sentences": args.sentences,
+            "density": args.density,
+            "seed": args.seed,
+            "characters": sum(len(x.text) for x in documents),
+        },
+        "stages": {},
+    }
+    for stage in [x.strip() for x in args.stages.split(",") if x.strip()]:
+        results["stages"][stage] = run_stage(
+            stage, documents, args.batch_size, args.n_process
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression in {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
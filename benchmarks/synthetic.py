@@ -0,0 +1,142 @@
+"""Synthetic Danish corpora and a stub NER model for offline benchmarks."""
+
+from typing import Dict, List, Set
+import random
+
+FIRST_NAMES = (
+    "Martin Anna Kristina Frank Ole Mette Søren Louise "
+    "Jens Camilla Mads Freja Niels Ida Rasmus Signe"
+).split()
+LAST_NAMES = (
+    "Jespersen Hansen Olsen Nielsen Pedersen Andersen "
+    "Christensen Larsen Sørensen Rasmussen Jørgensen Madsen"
+).split()
+LOCATIONS = ["Danmark", "Aarhus", "København", "Odense", "Aalborg", "Esbjerg"]
+ORGANISATIONS = ["Deloitte", "Novo Nordisk", "Netto", "DTU", "Region Hovedstaden"]
+FILLER = [
+    "Ingen oplysninger her.",
+    "Vi har modtaget din henvendelse og vender tilbage hurtigst muligt.",
+    "Mødet blev flyttet til næste uge på grund af sygdom.",
+    "Husk at medbringe de relevante dokumenter til samtalen.",
+]
+
+
+class Document(object):
+    """
+    A synthetic text and the entities put into it
+
+    Args:
+        text: The text
+        entities: The entities of the text by entity type
+
+    """
+
+    def __init__(self, text: str, entities: Dict[str, Set[str]]):
+        self.text = text
+        self.entities = entities
+
+
+def _sentence(rng: random.Random, entities: Dict[str, Set[str]]) -> str:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    kind = rng.randrange(7)
+    if kind == 0:
+        entities["PER"].update([f"{first} {last}", first])
+        return f"Hej, jeg hedder {first} {last}, men kald mig bare {first}."
+    elif kind == 1:
+        location = rng.choice(LOCATIONS)
+        entities["PER"].add(first)
+        entities["LOC"].add(location)
+        return f"{first} bor i {location} med sin familie."
+    elif kind == 2:
+        organisation = rng.choice(ORGANISATIONS)
+        entities["PER"].add(f"{first} {last}")
+        entities["ORG"].add(organisation)
+        return f"{first} {last} arbejder i {organisation}."
+    elif kind == 3:
+        cpr = "{:02d}{:02d}{:02d}-{:04d}".format(
+            rng.randint(1, 28),
+            rng.randint(1, 12),
+            rng.randint(0, 99),
+            rng.randint(0, 9999),
+        )
+        entities["CPR"].add(cpr)
+        return f"Mit cpr er {cpr}."
+    elif kind == 4:
+        phone = "+45{}".format(rng.randint(10**7, 10**8 - 1))
+        entities["TELEFON"].add(phone)
+        return f"Ring på telefon {phone} efter klokken 16."
+    elif kind == 5:
+        email = f"{first.lower()}.{last.lower()}@gmail.com"
+        entities["EMAIL"].add(email)
+        return f"Skriv til {email} hvis du har spørgsmål."
+    age = str(rng.randint(18, 99))
+    salary = "{}.{:03d},{:02d}".format(
+        rng.randint(10, 999), rng.randint(0, 999), rng.randint(0, 99)
+    )
+    entities["NUM"].update([age, salary])
+    return f"Han er {age} år og tjener {salary} kr om måneden."
+
+
+def generate_corpus(
+    n_docs: int, sentences: int = 10, density: float = 0.5, seed: int = 0
+) -> List[Document]:
+    """
+    Generates a reproducible corpus of Danish texts with known entities
+
+    Args:
+        n_docs: Number of texts
+        sentences: Average number of sentences per text
+        density: Fraction of sentences containing entities
+        seed: Seed of the random generator
+
+    Returns:
+        A list of documents
+
+    """
+    rng = random.Random(seed)  # nosec - reproducible synthetic data, not security
+    documents = []
+    for _ in range(n_docs):
+        entities: Dict[str, Set[str]] = {
+            x: set() for x in ["PER", "LOC", "ORG", "CPR", "TELEFON", "EMAIL", "NUM"]
+        }
+        parts = [
+            _sentence(rng, entities) if rng.random() < density else rng.choice(FILLER)
+            for _ in range(max(1, int(rng.gauss(sentences, sentences / 4))))
+        ]
+        documents.append(Document(" ".join(parts), entities))
+    return documents
+
+
+def make_stub_model():  # type: ignore
+    """
+    Builds a fast spaCy pipeline finding the names of the synthetic corpora with an
+    entity ruler and tagging tokens with digits as NUM, standing in for DaCy
+
+    Returns:
+        The spaCy pipeline
+    """
+    import spacy
+    from spacy.language import Language
+
+    if not Language.has_factory("benchmark_num_tagger"):
+
+        @Language.component("benchmark_num_tagger")
+        def num_tagger(doc):  # type: ignore
+            for token in doc:
+                if any(x.isdigit() for x in token.text):
+                    token.tag_ = "NUM"
+            return doc
+
+    nlp = spacy.blank("da")
+    ruler = nlp.add_pipe("entity_ruler")
+    patterns = [
+        {"label": "PER", "pattern": f"{first} {last}"}
+        for first in FIRST_NAMES
+        for last in LAST_NAMES
+    ]
+    patterns += [{"label": "PER", "pattern": x} for x in FIRST_NAMES + LAST_NAMES]
+    patterns += [{"label": "LOC", "pattern": x} for x in LOCATIONS]
+    patterns += [{"label": "ORG", "pattern": x} for x in ORGANISATIONS]
+    ruler.add_patterns(patterns)
+    nlp.add_pipe("benchmark_num_tagger")
+    return nlp
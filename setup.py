@@ -14,6 +14,10 @@ requirements = [
     "dacy",
 ]
 
+extra_requirements = {
+    "parquet": ["pyarrow"],
+}
+
 setup_requirements = [
     "pytest-runner",
 ]
@@ -44,6 +48,7 @@ setup(
         ],
     },
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="Apache license Version 2.0",
     long_description=readme + "\n\n" + history,
     include_package_data=True,
@@ -0,0 +1,35 @@
+"""Shared fixtures for the tests of `textprivacy`."""
+
+import pytest
+
+
+@pytest.fixture
+def stub_model():
+    """Registers a spaCy entity ruler standing in for DaCy, tagging numbers as NUM"""
+    import spacy
+    from spacy.language import Language
+
+    from textprivacy import models
+
+    if not Language.has_factory("test_num_tagger"):
+
+        @Language.component("test_num_tagger")
+        def num_tagger(doc):
+            for token in doc:
+                if token.like_num:
+                    token.tag_ = "NUM"
+            return doc
+
+    nlp = spacy.blank("da")
+    ruler = nlp.add_pipe("entity_ruler")
+    ruler.add_patterns(
+        [
+            {"label": "PER", "pattern": "Anna Hansen"},
+            {"label": "PER", "pattern": "Anna"},
+            {"label": "PER", "pattern": "Ole"},
+            {"label": "LOC", "pattern": "Aarhus"},
+        ]
+    )
+    nlp.add_pipe("test_num_tagger")
+    models.register_model("test-stub", nlp)
+    return "test-stub"
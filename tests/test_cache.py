@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+
+"""Tests for `textprivacy.cache`."""
+
+from textprivacy import NERCache
+from textprivacy.utils import EntitySpan
+
+
+def test_ner_cache(tmp_path):
+    """Tests LRU eviction, hit/miss counters and persistence in sqlite"""
+
+    path = str(tmp_path / "ner.db")
+    spans = [EntitySpan("PER", "Martin", 4, 10)]
+    cache = NERCache(maxsize=1, path=path)
+    key = cache.key("Hej Martin", "dacy-large", ["PER", "LOC", "ORG"])
+
+    assert key != cache.key("Hej Martin", "dacy-small", ["PER", "LOC", "ORG"])
+    assert cache.get(key) is None
+
+    cache.put(key, spans)
+    cache.put(cache.key("Hej Ole", "dacy-large", ["PER"]), [])
+
+    # evicted from memory but still found on disk
+    assert cache.get(key) == spans
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+    cache.close()
+
+    assert NERCache(path=path).get(key) == spans
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""Tests for `textprivacy.columnar`."""
+
+import pytest
+
+from textprivacy import TextAnonymizer
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from textprivacy.columnar import mask_parquet, mask_table  # noqa: E402
+
+
+def test_mask_parquet(tmp_path):
+    """Tests masking a text column batch by batch, keeping other columns and nulls"""
+
+    table = pa.table(
+        {
+            "id": [1, 2, 3, 4, 5],
+            "text": [
+                "Mit cpr er 010203-2010",
+                None,
+                "Skriv til jakob.jakobsen@gmail.com",
+                "",
+                "Ring på +4545454545",
+            ],
+        }
+    )
+    test_output = [
+        "Mit cpr er [CPR]",
+        None,
+        "Skriv til [EMAIL]",
+        "",
+        "Ring på [TELEFON]",
+    ]
+    pq.write_table(table, tmp_path / "in.parquet", row_group_size=2)
+    settings = dict(
+        masking_order=["CPR", "TELEFON", "EMAIL"], n_process=1, loglevel="CRITICAL"
+    )
+
+    n_rows = mask_parquet(
+        TextAnonymizer(),
+        str(tmp_path / "in.parquet"),
+        str(tmp_path / "out.parquet"),
+        rows_per_batch=2,
+        **settings,
+    )
+    masked = pq.read_table(tmp_path / "out.parquet")
+
+    assert n_rows == 5
+    assert masked.schema.equals(table.schema)
+    assert masked.column("id").to_pylist() == [1, 2, 3, 4, 5]
+    assert masked.column("text").to_pylist() == test_output
+    assert mask_table(TextAnonymizer(), table, **settings).equals(masked)
+
+    with pytest.raises(ValueError):
+        mask_parquet(
+            TextAnonymizer(),
+            table,
+            str(tmp_path / "out.parquet"),
+            column="id",
+            **settings,
+        )
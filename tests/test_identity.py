@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+"""Tests for `textprivacy.identity`."""
+
+from textprivacy import IdentityTable
+
+
+def test_identity_table(tmp_path):
+    """Tests consistent IDs across texts, merging of tables and persistence"""
+
+    table = IdentityTable()
+    first = table.assign({1: {"PER": {"Martin Jespersen"}}, 2: {"LOC": {"Aarhus"}}})
+    second = table.assign(
+        {1: {"PER": {"Anna Hansen"}}, 2: {"PER": {"martin  jespersen", "Martin"}}}
+    )
+
+    assert list(first) == [1, 2]
+    assert second == {
+        3: {"PER": {"Anna Hansen"}},
+        1: {"PER": {"martin  jespersen", "Martin"}},
+    }
+    assert table.get("PER", "MARTIN") == 1
+    assert table.get("LOC", "Martin") is None
+
+    other = IdentityTable()
+    other.assign({1: {"PER": {"Ole"}}, 2: {"PER": {"Anna Hansen"}}})
+    assert table.merge(other) == {1: 4, 2: 3}
+    assert table.next_id == 5
+
+    path = str(tmp_path / "identities.json")
+    table.save(path)
+    loaded = IdentityTable.load(path)
+    assert loaded.to_dict() == table.to_dict()
+    assert loaded.assign({1: {"PER": {"Ole"}}}) == {4: {"PER": {"Ole"}}}
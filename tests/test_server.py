@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""Tests for `textprivacy.server`."""
+
+import json
+import threading
+import urllib.request
+
+from textprivacy import TextAnonymizer, TextPseudonymizer
+from textprivacy.server import MaskingService, make_server
+
+
+def test_masking_service():
+    """Tests concurrent texts are masked together in micro-batches over HTTP"""
+
+    service = MaskingService(
+        TextAnonymizer(),
+        masking_order=["CPR", "EMAIL"],
+        max_batch_size=4,
+        max_latency=0.2,
+    )
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:{}".format(server.server_port)
+
+    def post(body):
+        request = urllib.request.Request(
+            url + "/mask", data=json.dumps(body).encode("utf-8")
+        )
+        return json.loads(urllib.request.urlopen(request).read())
+
+    results = [None] * 4
+
+    def mask(i):
+        results[i] = post({"text": "cpr {}: 010203-201{}".format(i, i)})
+
+    threads = [threading.Thread(target=mask, args=(i,)) for i in range(4)]
+    for x in threads:
+        x.start()
+    for x in threads:
+        x.join()
+
+    try:
+        expected = ["cpr {}: [CPR]".format(i) for i in range(4)]
+        assert [x["masked"] for x in results] == expected
+        assert all(x["latency_ms"] > 0 for x in results)
+        assert max(x["batch_size"] for x in results) > 1
+        assert post({"texts": ["a@b.dk", "hej"]})["masked"] == ["[EMAIL]", "hej"]
+
+        health = json.loads(urllib.request.urlopen(url + "/health").read())
+        assert health["requests_processed"] == 6
+        assert health["batches_processed"] < 6
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def test_masking_service_pseudonymizer(stub_model):
+    """Tests pseudonyms of one request do not carry over to the next"""
+
+    individuals = {0: {1: {"PER": {"Ole"}}}}
+    service = MaskingService(
+        TextPseudonymizer(individuals=individuals, model_size=stub_model),
+        masking_order=["NER"],
+        n_process=1,
+    )
+    try:
+        first = service.mask(["Anna Hansen bor i Aarhus"])
+        second = service.mask(["Ole bor i Aarhus"])
+    finally:
+        service.close()
+
+    assert first["masked"] == ["Person 1 bor i Lokation 2"]
+    assert second["masked"] == ["Person 1 bor i Lokation 2"]
+    assert service.mask_transformer.individuals == {0: {1: {"PER": {"Ole"}}}}
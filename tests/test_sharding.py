@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""Tests for `textprivacy.sharding`."""
+
+import os
+
+import pytest
+
+from textprivacy import TextAnonymizer
+from textprivacy.sharding import merge_shards, mask_shard, parse_shard, shard_of
+
+
+def test_parse_shard():
+    """Tests parsing shards given as i/N"""
+
+    assert parse_shard("0/4") == (0, 4)
+    assert parse_shard(" 3 / 4 ") == (3, 4)
+    for value in ["4/4", "1", "a/b", "-1/4"]:
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_shard_of():
+    """Tests documents are assigned to shards by index or by a stable key hash"""
+
+    assert [shard_of(i, 3) for i in range(6)] == [0, 1, 2, 0, 1, 2]
+    assert shard_of(0, 3, "doc-17") == shard_of(5, 3, "doc-17") == 2
+
+
+def test_mask_and_merge_shards(tmp_path):
+    """Tests masking all shards and merging them back in order, and failed merges"""
+
+    corpus = ["Mit cpr er 010203-20{:02d}".format(i) for i in range(10)]
+    settings = dict(masking_order=["CPR"], n_process=1, loglevel="CRITICAL")
+
+    for shard in range(3):
+        manifest = mask_shard(
+            TextAnonymizer(),
+            corpus,
+            str(tmp_path),
+            shard,
+            3,
+            key=lambda text: text,
+            **settings,
+        )
+        assert manifest["total"] == 10
+
+    assert list(merge_shards(str(tmp_path))) == ["Mit cpr er [CPR]"] * 10
+
+    # a changed part fails its checksum
+    with open(tmp_path / "part-00001-of-00003.jsonl", "a") as f:
+        f.write('{"index": 0, "record": "Mit cpr er 010203-2000"}\n')
+    with pytest.raises(ValueError, match="Checksum"):
+        list(merge_shards(str(tmp_path)))
+
+    os.remove(tmp_path / "part-00001-of-00003.manifest.json")
+    with pytest.raises(ValueError, match="Missing shards"):
+        list(merge_shards(str(tmp_path)))
@@ -132,3 +132,379 @@ def test_custom_mask(response):
     assert masked_corpus == test_output, "{}\nvs.\n{}".format(
         masked_corpus[0], test_output[0]
     )
+
+
+def test_regex_only_skips_model(response):
+    """Tests that masking without NER does not load the DaCy model"""
+
+    from textprivacy import models
+
+    test_corpus = ["Mit cpr er 010203-2010 og min email er jakob.jakobsen@gmail.com"]
+    test_output = ["Mit cpr er [CPR] og min email er [EMAIL]"]
+    CorpusObj = TextAnonymizer(test_corpus, model_size="small")
+    masked_corpus = CorpusObj.mask_corpus(
+        masking_order=["CPR", "TELEFON", "EMAIL"], loglevel="CRITICAL"
+    )
+
+    assert masked_corpus == test_output
+    assert not models.is_loaded("small")
+    assert models.load_time("small") is None
+
+
+def test_mask_entities_single_pass(response):
+    """Tests that longer entities take priority and subwords are left untouched"""
+
+    test_string = "Ole Olsen Olesen og Hansen, Ole.\nOle Hansen"
+    test_output = "[PERSON] Olesen og [PERSON], [PERSON].\n[PERSON]"
+    CorpusObj = TextAnonymizer()
+    output = CorpusObj.mask_entities(
+        test_string, {"Ole", "Ole Olsen", "Hansen", "Ole Hansen"}, "PER"
+    )
+
+    assert output == test_output
+
+
+def test_mask_entities_placeholder(response):
+    """Tests that entities equal to a placeholder are not masked inside placeholders"""
+
+    CorpusObj = TextAnonymizer()
+    output = CorpusObj.mask_entities(
+        "Ole Hansen og PERSON", {"Ole Hansen", "PERSON"}, "PER"
+    )
+
+    # masking one entity after another gave "[[PERSON]] og [PERSON]"
+    assert output == "[PERSON] og [PERSON]"
+
+    output = CorpusObj.mask_entities(
+        "Ole Hansen og Ole", {"Ole Hansen", "PERSON", "Ole"}, "PER", " 1"
+    )
+
+    # masking one entity after another gave "[[PERSON] 1] 1 og [PERSON] 1"
+    assert output == "[PERSON] 1 og [PERSON] 1"
+
+
+def test_mask_long_entities(response):
+    """Tests that entities of hundreds of characters are masked, longest first"""
+
+    address = "Vej " * 150 + "1"
+    test_string = f"Bor på {address}, {address[:299]} og Vej 2"
+    CorpusObj = TextAnonymizer()
+    output = CorpusObj.mask_entities(
+        test_string, {address, address[:299], "Vej"}, "LOC"
+    )
+
+    assert output == "Bor på [LOKATION], [LOKATION] og [LOKATION] 2"
+
+
+def test_compiled_detector_mask(response):
+    """Tests adding a compiled regex detector next to the built-in detectors"""
+
+    test_corpus = ["Firmaet har CVR DK12345678, telefon +4545454545 og cpr 010203-2010"]
+    test_output = ["Firmaet har CVR [CVR], telefon [TELEFON] og cpr [CPR]"]
+    CorpusObj = TextAnonymizer(test_corpus)
+    CorpusObj.mapping.update({"CVR": "[CVR]"})
+    masked_corpus = CorpusObj.mask_corpus(
+        masking_order=["CVR", "CPR", "TELEFON", "EMAIL"],
+        custom_functions={"CVR": re.compile(r"DK\d{8}")},
+        loglevel="CRITICAL",
+    )
+
+    assert masked_corpus == test_output
+
+
+# texts where detectors overlap, masked as by running each detector after the other
+DETECTOR_OVERLAPS = [
+    ("Ref 1234 010203-2010", "Ref 1234 [CPR]"),
+    ("kode 20 1234 010203-2010", "kode 20 1234 [CPR]"),
+    ("Skriv til ole12345678@gmail.com i dag", "Skriv til [EMAIL] i dag"),
+    ("Nr 0102030405 45454545", "Nr 0102030405 [TELEFON]"),
+    ("2010-12345678 010203-2010", "2010-12345678 [CPR]"),
+    ("a.b@c.dk010203-2010", "[EMAIL]-2010"),
+]
+
+
+def test_detector_priority(response):
+    """Tests that overlapping detectors mask as when masking one detector at a time"""
+
+    test_corpus = [text for text, _ in DETECTOR_OVERLAPS]
+    test_output = [masked for _, masked in DETECTOR_OVERLAPS]
+    CorpusObj = TextAnonymizer(test_corpus)
+    masked_corpus = CorpusObj.mask_corpus(
+        masking_order=["CPR", "TELEFON", "EMAIL"], loglevel="CRITICAL"
+    )
+
+    assert masked_corpus == test_output
+
+
+def test_mask_stream(response):
+    """Tests lazily masking a stream of (index, text) pairs with prior individuals"""
+
+    def texts():
+        yield (7, "Ring 112 eller +4545454545")
+        yield (3, "Ring 112 eller skriv til jakob.jakobsen@gmail.com")
+
+    test_output = [
+        "Ring [TELEFON] eller [TELEFON]",
+        "Ring 112 eller skriv til [EMAIL]",
+    ]
+    CorpusObj = TextAnonymizer(individuals={7: {"TELEFON": {"112"}}})
+    masked_stream = CorpusObj.mask_stream(
+        texts(),
+        masking_order=["CPR", "TELEFON", "EMAIL"],
+        chunk_size=1,
+        loglevel="CRITICAL",
+    )
+
+    assert list(masked_stream) == test_output
+
+
+def test_compact_doc(response):
+    """Tests reducing a spaCy Doc to picklable entity spans"""
+
+    import pickle
+
+    import spacy
+    from spacy.tokens import Span
+
+    from textprivacy.textanonymization import compact_doc
+    from textprivacy.utils import EntitySpan
+
+    doc = spacy.blank("da")("Martin Jespersen er 20 år")
+    doc.ents = [Span(doc, 0, 2, label="PER")]
+    doc[3].tag_ = "NUM"
+
+    spans = compact_doc(doc, with_numbers=True)
+
+    assert spans == [
+        EntitySpan("PER", "Martin Jespersen", 0, 16),
+        EntitySpan("NUM", "20", 20, 22),
+    ]
+    assert pickle.loads(pickle.dumps(spans)) == spans
+    assert compact_doc(doc, with_numbers=False) == spans[:1]
+
+
+def test_executor_shutdown(response):
+    """Tests that a closed NER executor refuses new work"""
+
+    from textprivacy import NERExecutor
+
+    with NERExecutor(model_size="small", n_process=4) as executor:
+        assert executor.threads_per_worker >= 1
+
+    with pytest.raises(RuntimeError):
+        executor.predict(["Hej Martin"], batch_size=1, with_numbers=False)
+
+
+def test_parallel_masking(response):
+    """Tests that masking in worker processes keeps the order of the corpus"""
+
+    test_corpus = [
+        f"Tekst {i}: cpr 0102{i:02d}-2010, telefon +45454545{i:02d}" for i in range(6)
+    ]
+    test_output = [f"Tekst {i}: cpr [CPR], telefon [TELEFON]" for i in range(6)]
+    CorpusObj = TextAnonymizer(test_corpus)
+    masked_corpus = CorpusObj.mask_corpus(
+        masking_order=["CPR", "TELEFON", "EMAIL"],
+        n_process=2,
+        parallel_masking=True,
+        loglevel="CRITICAL",
+    )
+
+    assert masked_corpus == test_output
+
+
+def test_cli_mask_file(response):
+    """Tests streaming JSONL and CSV records through the command line masking"""
+
+    import io
+
+    records = (
+        '{"id": 1, "text": "Mit cpr er 010203-2010"}\n'
+        '{"id": 2}\n'
+        '{"id": 3, "text": "Skriv til jakob.jakobsen@gmail.com"}\n'
+    )
+    target = io.StringIO()
+    n_records = cli.mask_file(
+        TextAnonymizer(),
+        io.StringIO(records),
+        target,
+        "jsonl",
+        masking_order=["CPR", "TELEFON", "EMAIL"],
+        n_process=1,
+        loglevel="CRITICAL",
+    )
+
+    assert n_records == 3
+    assert target.getvalue() == (
+        '{"id": 1, "text": "Mit cpr er [CPR]"}\n'
+        '{"id": 2}\n'
+        '{"id": 3, "text": "Skriv til [EMAIL]"}\n'
+    )
+
+    target = io.StringIO()
+    cli.mask_file(
+        TextAnonymizer(),
+        io.StringIO('id,besked\n1,"Ring på 45454545, tak"\n'),
+        target,
+        "csv",
+        column="besked",
+        masking_order=["TELEFON"],
+        n_process=1,
+        loglevel="CRITICAL",
+    )
+
+    assert target.getvalue().splitlines() == [
+        "id,besked",
+        '1,"Ring på [TELEFON], tak"',
+    ]
+
+
+def test_amask_stream(response):
+    """Tests async masking keeps the order of the texts and can be stopped early"""
+
+    import asyncio
+
+    texts = ["Mit cpr er 01020{}-2010".format(i) for i in range(10)]
+
+    async def source():
+        for text in texts:
+            yield text
+
+    async def consume():
+        Anonymizer = TextAnonymizer(texts)
+        corpus = await Anonymizer.amask_corpus(
+            masking_order=["CPR"], n_process=1, chunk_size=3, loglevel="CRITICAL"
+        )
+
+        first = []
+        stream = Anonymizer.amask_stream(
+            source(), masking_order=["CPR"], n_process=1, chunk_size=3, prefetch=1
+        )
+        async for text in stream:
+            first.append(text)
+            if len(first) == 4:
+                break
+        await stream.aclose()
+        return corpus, first
+
+    corpus, first = asyncio.run(consume())
+
+    assert corpus == ["Mit cpr er [CPR]"] * 10
+    assert first == ["Mit cpr er [CPR]"] * 4
+
+
+def test_offset_masking(response):
+    """Tests masking entities at their offsets, searching only for preset individuals"""
+
+    from textprivacy.utils import EntitySpan
+
+    text = "Anna fra Aarhus ringede, og Anna har cpr 010203-2010 som Ole"
+    ner_spans = [
+        EntitySpan("PER", "Anna", 0, 4),
+        EntitySpan("LOC", "Aarhus ", 9, 16),
+        EntitySpan("PER", "cpr 010203", 37, 47),
+    ]
+    CorpusObj = TextAnonymizer(individuals={0: {"PER": {"Ole"}}})
+    methods = CorpusObj._setup("1", ["CPR", "NER"], {}, 8, 1, None, "CRITICAL")
+    masked = CorpusObj._apply_offset_masks(text, methods, ["CPR", "NER"], ner_spans, 0)
+
+    # the second Anna is not a span, the CPR detector wins over the overlapping NER span
+    assert masked == (
+        "[PERSON] fra [LOKATION] ringede, og Anna har cpr [CPR] som [PERSON]"
+    )
+
+    CorpusObj = TextAnonymizer(["Ring til +4545454545 eller mail a@b.dk"])
+    masked_corpus = CorpusObj.mask_corpus(
+        masking_order=["CPR", "TELEFON", "EMAIL"],
+        loglevel="CRITICAL",
+        offset_masking=True,
+    )
+
+    assert masked_corpus == ["Ring til [TELEFON] eller mail [EMAIL]"]
+
+
+def test_offset_detector_priority(response):
+    """Tests that offset masking of overlapping detectors leaks no entities"""
+
+    test_corpus = [text for text, _ in DETECTOR_OVERLAPS]
+    test_output = [masked for _, masked in DETECTOR_OVERLAPS]
+    CorpusObj = TextAnonymizer(test_corpus)
+    masked_corpus = CorpusObj.mask_corpus(
+        masking_order=["CPR", "TELEFON", "EMAIL"],
+        loglevel="CRITICAL",
+        offset_masking=True,
+    )
+
+    assert masked_corpus == test_output
+
+
+def test_checkpointed_mask_corpus(response, tmp_path):
+    """Tests resuming a checkpointed job skips the batches already masked"""
+
+    import os
+
+    calls = []
+
+    def find_cvr(text):
+        calls.append(text)
+        return set(re.findall(r"DK\d{8}", text))
+
+    test_corpus = [f"CVR DK1234567{i} og cpr 010203-201{i}" for i in range(5)]
+    test_output = ["CVR [CVR] og cpr [CPR]"] * 5
+    settings = dict(
+        masking_order=["CPR", "CVR"],
+        custom_functions={"CVR": find_cvr},
+        loglevel="CRITICAL",
+        checkpoint_dir=str(tmp_path),
+        checkpoint_size=2,
+    )
+
+    CorpusObj = TextAnonymizer(test_corpus)
+    CorpusObj.mapping.update({"CVR": "[CVR]"})
+    assert CorpusObj.mask_corpus(**settings) == test_output
+    assert len(calls) == 5
+
+    # lose the last batch, as if the job had been stopped before writing it
+    os.remove(tmp_path / "batch-0000000004-0000000005.json")
+    calls.clear()
+    CorpusObj = TextAnonymizer(test_corpus)
+    CorpusObj.mapping.update({"CVR": "[CVR]"})
+    assert CorpusObj.mask_corpus(**settings) == test_output
+    assert calls == ["CVR DK12345674 og cpr [CPR]"]
+
+    with pytest.raises(ValueError):
+        TextAnonymizer(test_corpus).mask_corpus(**settings)
+
+
+def test_masking_stats(response):
+    """Tests collecting stage timings, entity counts and the slowest texts of a run"""
+
+    from textprivacy import MaskingStats
+
+    def find_cvr(text):
+        return set(re.findall(r"DK\d{8}", text))
+
+    test_corpus = [
+        "Mit cpr er 010203-2010 og min email er jakob.jakobsen@gmail.com",
+        "CVR DK12345678",
+        "Ingen oplysninger her",
+    ]
+    stats = MaskingStats(n_slowest=2)
+    CorpusObj = TextAnonymizer(test_corpus)
+    CorpusObj.mapping.update({"CVR": "[CVR]"})
+    CorpusObj.mask_corpus(
+        masking_order=["CPR", "EMAIL", "CVR"],
+        custom_functions={"CVR": find_cvr},
+        loglevel="CRITICAL",
+        stats=stats,
+    )
+    summary = stats.to_dict()
+
+    assert summary["documents"] == 3
+    assert summary["bytes"] == sum(len(x.encode("utf-8")) for x in test_corpus)
+    assert summary["entities"] == {"CPR": 1, "EMAIL": 1, "CVR": 1}
+    assert set(summary["stages"]) == {"detectors", "detect:CVR", "masking"}
+    # the cpr and email detectors run on each text
+    assert summary["stages"]["detectors"]["calls"] == 6
+    assert len(summary["slowest"]) == 2
+    assert CorpusObj._stats is None
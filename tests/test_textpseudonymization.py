@@ -7,6 +7,7 @@ import pytest
 from click.testing import CliRunner
 
 from textprivacy import TextPseudonymizer
+from textprivacy import textanonymization
 
 import re
 
@@ -86,3 +87,149 @@ def test_prior_individuals(response):
     assert masked_corpus == test_output, "{}\nvs.\n{}".format(
         masked_corpus[0], test_output[0]
     )
+
+
+def test_update_entity_linking(response):
+    """Tests entities are paired with individuals whose aliases contain them"""
+
+    pseudonymizer = TextPseudonymizer([])
+    individuals = {3: {"PER": {"Martin Jespersen"}}, 4: {"LOC": {"Aarhus"}}}
+
+    pseudonymizer._update_entity(
+        {"Jespersen", "martin", "Anna Hansen", "Anna", "Hans"}, individuals, "PER"
+    )
+
+    assert individuals[3]["PER"] == {"Martin Jespersen", "Jespersen", "martin"}
+    assert individuals[4] == {"LOC": {"Aarhus"}}
+    assert individuals[5]["PER"] == {"Anna Hansen", "Anna", "Hans"}
+    assert len(individuals) == 3
+
+
+def test_apply_masks_single_pass(response):
+    """Tests numbers equal to a placeholder suffix are not masked inside placeholders"""
+
+    pseudonymizer = TextPseudonymizer([], mask_numbers=True)
+    text = "Anna Hansen er 2 år og bor i Aarhus"
+    ner_entities = {
+        "PER": {"Anna Hansen"},
+        "LOC": {"Aarhus"},
+        "ORG": set(),
+        "NUM": {"2"},
+    }
+
+    masked = pseudonymizer._apply_masks(text, {}, ["NER"], ner_entities, 0)
+
+    assert masked == "Person 1 er Nummer 3 år og bor i Lokation 2"
+
+
+def test_offset_masking(response):
+    """Tests pseudonyms are placed at the offsets of the entities found"""
+
+    from textprivacy.utils import EntitySpan
+
+    pseudonymizer = TextPseudonymizer([], individuals={0: {1: {"PER": {"Ole"}}}})
+    text = "Anna Hansen bor i Aarhus, Anna kender Ole"
+    ner_spans = [
+        EntitySpan("PER", "Anna Hansen", 0, 11),
+        EntitySpan("LOC", "Aarhus", 18, 24),
+        EntitySpan("PER", "Anna", 26, 30),
+    ]
+
+    masked = pseudonymizer._apply_offset_masks(text, {}, ["NER"], ner_spans, 0)
+
+    assert masked == "Person 2 bor i Lokation 3, Person 2 kender Person 1"
+    assert pseudonymizer.individuals[0][2]["PER"] == {"Anna Hansen", "Anna"}
+
+
+def test_mask_stream_bounded_individuals(stub_model):
+    """Tests streaming keeps only preset individuals unless asked to keep all"""
+
+    texts = ["Anna Hansen bor i Aarhus"] * 50 + ["Anna kender Ole"]
+    pseudonymizer = TextPseudonymizer(
+        individuals={50: {1: {"PER": {"Ole"}}}}, model_size=stub_model
+    )
+    masked = list(
+        pseudonymizer.mask_stream(
+            texts, masking_order=["NER"], n_process=1, loglevel="CRITICAL"
+        )
+    )
+
+    assert masked[0] == "Person 1 bor i Lokation 2"
+    assert masked[-1] == "Person 2 kender Person 1"
+    assert list(pseudonymizer.individuals) == [50]
+
+    masked = list(
+        pseudonymizer.mask_stream(
+            texts[:3],
+            masking_order=["NER"],
+            n_process=1,
+            loglevel="CRITICAL",
+            retain_individuals=True,
+        )
+    )
+
+    assert sorted(pseudonymizer.individuals) == [0, 1, 2, 50]
+    assert TextPseudonymizer().individuals is not TextPseudonymizer().individuals
+
+
+def test_masking_worker_bounded_individuals(stub_model):
+    """Tests masking workers send back individuals without keeping them"""
+
+    pseudonymizer = TextPseudonymizer(
+        individuals={1: {1: {"PER": {"Ole"}}}}, model_size=stub_model
+    )
+    ner_entities = {"PER": {"Ole"}, "LOC": set(), "ORG": set()}
+    textanonymization._masking_context.update(
+        anonymizer=pseudonymizer, methods={}, masking_order=["NER"]
+    )
+    try:
+        results = textanonymization.masking_worker(
+            [(0, "Hej Ole", ner_entities), (1, "Hej Ole", ner_entities)]
+        )
+    finally:
+        textanonymization._masking_context.clear()
+
+    assert [text for _, text, _ in results] == ["Hej Person 1"] * 2
+    assert results[0][2][1]["PER"] == {"Ole"}
+    assert list(pseudonymizer.individuals) == [1]
+
+    texts = [f"Anna Hansen har nummer {i}" for i in range(20)]
+    masked = list(
+        TextPseudonymizer(model_size=stub_model).mask_stream(
+            texts,
+            masking_order=["NER"],
+            n_process=2,
+            chunk_size=10,
+            parallel_masking=True,
+            loglevel="CRITICAL",
+        )
+    )
+
+    assert masked == [f"Person 1 har nummer {i}" for i in range(20)]
+
+
+def test_apply_masks_noisy_numbers(stub_model):
+    """Tests invalid numbers get a numbered placeholder and placeholders keep numbers"""
+
+    pseudonymizer = TextPseudonymizer(
+        mask_numbers=True, epsilon=1.0, seed=0, model_size=stub_model
+    )
+    text = "Anna Hansen har kode 1.2.3,4,5 og 1 bil"
+    ner_entities = {
+        "PER": {"Anna Hansen"},
+        "LOC": set(),
+        "ORG": set(),
+        "NUM": {"1.2.3,4,5", "1"},
+    }
+
+    masked = pseudonymizer._apply_masks(text, {}, ["NER"], ner_entities, 0)
+
+    assert masked.startswith("Person 1 har kode Nummer 2 og ")
+    assert masked.endswith(" bil")
+    assert re.fullmatch(r"-?\d+", masked.split(" ")[-2])
+
+    masked = pseudonymizer.noisy_numbers(
+        "Person 1 har 1.2.3,4,5", {"1.2.3,4,5": " 3", "1": " 4"}, 1.0, "Nummer"
+    )
+
+    assert masked == "Person 1 har Nummer 3"
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+"""Tests for `textprivacy.utils`."""
+
+import random
+
+import numpy as np
+
+from textprivacy.utils import (
+    is_valid_number,
+    get_integer,
+    get_float,
+    parse_number,
+    AliasIndex,
+    token_batches,
+    split_text,
+    merge_chunk_spans,
+    laplace_noise_batch,
+    EntitySpan,
+)
+
+
+def test_token_batches():
+    """Tests grouping texts by length under a token budget"""
+
+    texts = ["ord " * n for n in [5, 100, 3, 50, 51, 2, 400]]
+    batches = token_batches(texts, max_tokens=120)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(texts)))
+    assert batches[0] == [6]
+    for batch in batches:
+        longest = max(len(texts[i].split()) + 1 for i in batch)
+        assert len(batch) == 1 or len(batch) * longest <= 120
+
+
+def test_split_text():
+    """Tests splitting long texts into overlapping windows"""
+
+    text = "Hej Martin. " * 5 + "Ole Olsen bor her og der og alle steder i hele verden"
+    chunks = split_text(text, max_tokens=8, overlap=3)
+
+    assert len(chunks) > 1
+    assert all(text[offset : offset + len(chunk)] == chunk for offset, chunk in chunks)
+    assert all(len(chunk.split()) <= 8 for _, chunk in chunks)
+    assert chunks[0][1].endswith(".")
+    assert chunks[-1][1].endswith("verden")
+    assert split_text("kort tekst", max_tokens=8) == [(0, "kort tekst")]
+
+
+def test_merge_chunk_spans():
+    """Tests that entities cut at the edge of a window are merged into one entity"""
+
+    spans = merge_chunk_spans(
+        [
+            (0, [EntitySpan("LOC", "Aarhus", 0, 6), EntitySpan("PER", "Ole", 20, 23)]),
+            (15, [EntitySpan("PER", "Ole Olsen", 5, 14)]),
+        ],
+        length=40,
+    )
+
+    assert spans == [
+        EntitySpan("LOC", "Aarhus", 0, 6),
+        EntitySpan("PER", "Ole Olsen", 20, 29),
+    ]
+
+
+def test_laplace_noise_batch():
+    """Tests vectorized noise is reproducible and follows the integer and sign rules"""
+
+    numbers = [20, 3.25, -4.5, 1000]
+    signs = ["", "", "-", ""]
+    kinds = ["integer", "float", "float", "integer"]
+
+    noisy = laplace_noise_batch(numbers, 0.1, signs, kinds, np.random.default_rng(1))
+
+    assert noisy == laplace_noise_batch(
+        numbers, 0.1, signs, kinds, np.random.default_rng(1)
+    )
+    assert [type(x) for x in noisy] == [int, float, float, int]
+    assert all(x >= 0 for x, sign in zip(noisy, signs) if not sign)
+    assert laplace_noise_batch([], 0.1, [], [], np.random.default_rng(1)) == []
+
+
+def _legacy_parse(number):
+    validity = is_valid_number(number)
+    if validity == "float":
+        value, precision, sign = get_float(number)
+        return validity, value, precision, sign
+    elif validity == "integer":
+        return validity, get_integer(number), 0, ""
+    return validity, None, 0, ""
+
+
+def test_parse_number():
+    """Tests the single pass number parser agrees with the legacy parsing chain"""
+
+    assert parse_number("1.234,56") == ("float", 1234.56, 2, "")
+    assert parse_number("1,234.56") == ("float", 1234.56, 2, "")
+    assert parse_number("-3,5") == ("float", -3.5, 1, "-")
+    assert parse_number("1.000.000") == ("integer", 1000000, 0, "")
+    assert parse_number("1.2.3,4,5") == ("invalid", None, 0, "")
+
+    rng = random.Random(0)
+    examples = ["42", "2.021", "1,000,000", "3,14", "0.75", "-12", "12-34", "1.5%"]
+    for _ in range(20000):
+        size = rng.randint(1, 12)
+        examples.append("".join(rng.choice("0123456789.,-+/ kr") for _ in range(size)))
+
+    for number in examples:
+        if not any(x.isdigit() for x in number):
+            continue
+        assert parse_number(number) == _legacy_parse(number), number
+
+
+def test_alias_index():
+    """Tests case-insensitive substring lookups of aliases"""
+
+    index = AliasIndex([("Martin Jespersen", 1), ("Anna", 2), ("Jespersen, Martin", 3)])
+    index.add("Hans Hansen", {4, 5})
+
+    assert index.find("jespersen") == {1, 3}
+    assert index.find("ANNA") == {2}
+    assert index.find("hansen") == {4, 5}
+    # matches never span two aliases
+    assert index.find("n\x00a") == set()
+    assert index.find("Peter") == set()
+    assert AliasIndex().find("") == set()
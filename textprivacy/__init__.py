@@ -4,5 +4,11 @@ __author__ = """Martin Closter Jespersen"""
 __email__ = "martincjespersen@gmail.com"
 __version__ = "0.1.0"
 from textprivacy import utils
+from textprivacy import models
+from textprivacy import detectors
 from textprivacy.textanonymization import TextAnonymizer
 from textprivacy.textpseudonymization import TextPseudonymizer
+from textprivacy.executor import NERExecutor
+from textprivacy.cache import NERCache
+from textprivacy.identity import IdentityTable
+from textprivacy.stats import MaskingStats
@@ -0,0 +1,187 @@
+"""Content addressed cache of NER results."""
+
+from typing import List, Dict, Optional, Tuple, Iterable
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+
+from textprivacy.utils import EntitySpan
+
+
+class NERCache(object):
+    """
+    Cache of the entity spans found by DaCy, keyed on a hash of the text, the model and the
+    entity types. Keeps the most recently used texts in memory and optionally persists all
+    results in a sqlite database, so repeated texts skip the model entirely
+
+    Args:
+        maxsize: Number of texts to keep in memory
+        path: Path of a sqlite database backing the cache (default is memory only)
+
+    """
+
+    def __init__(self, maxsize: int = 10000, path: str = None):
+        super(NERCache, self).__init__()
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, List[EntitySpan]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS ner (key TEXT PRIMARY KEY, spans TEXT)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(text: str, model_id: str, labels: Iterable[str]) -> str:
+        """
+        Computes the cache key of a text
+
+        Args:
+            text: The text predicted on
+            model_id: Name and version of the model and any settings changing its predictions
+            labels: Entity types included in the results
+
+        Returns:
+            A hex digest identifying the result
+
+        """
+        digest = hashlib.sha256()
+        digest.update(model_id.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(",".join(sorted(labels)).encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[EntitySpan]]:
+        """
+        Looks up the entity spans of a text
+
+        Args:
+            key: Cache key of the text
+
+        Returns:
+            The cached entity spans, or None if the text has not been seen
+
+        """
+        with self._lock:
+            spans = self._memory.get(key)
+            if spans is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT spans FROM ner WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    spans = [EntitySpan(*x) for x in json.loads(row[0])]
+                    self._remember(key, spans)
+
+            if spans is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return spans
+
+    def put_many(self, items: List[Tuple[str, List[EntitySpan]]]) -> None:
+        """
+        Stores the entity spans of several texts
+
+        Args:
+            items: A list of cache keys and entity spans
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            for key, spans in items:
+                self._remember(key, spans)
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO ner (key, spans) VALUES (?, ?)",
+                    [
+                        (
+                            key,
+                            json.dumps(
+                                [[x.label, x.text, x.start, x.end] for x in spans]
+                            ),
+                        )
+                        for key, spans in items
+                    ],
+                )
+                self._db.commit()
+
+    def put(self, key: str, spans: List[EntitySpan]) -> None:
+        """
+        Stores the entity spans of a text
+
+        Args:
+            key: Cache key of the text
+            spans: Entity spans found in the text
+
+        Returns:
+            None
+
+        """
+        self.put_many([(key, spans)])
+
+    def _remember(self, key: str, spans: List[EntitySpan]) -> None:
+        """
+        Adds spans to the in-memory LRU, evicting the least recently used text when full
+
+        Args:
+            key: Cache key of the text
+            spans: Entity spans found in the text
+
+        Returns:
+            None
+
+        """
+        self._memory[key] = spans
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Reports the usage of the cache
+
+        Returns:
+            A dictionary of hits, misses and texts held in memory
+
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._memory)}
+
+    def clear(self) -> None:
+        """
+        Empties the cache, including the sqlite database
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM ner")
+                self._db.commit()
+
+    def close(self) -> None:
+        """
+        Closes the sqlite database
+
+        Returns:
+            None
+
+        """
+        if self._db is not None:
+            self._db.close()
+            self._db = None
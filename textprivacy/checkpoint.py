@@ -0,0 +1,210 @@
+"""On-disk checkpoints of corpus masking jobs."""
+
+from typing import List, Dict, Optional, Tuple, Any
+import hashlib
+import json
+import logging
+import os
+
+from textprivacy.utils import write_json_atomic
+
+States = Dict[int, Any]
+
+
+def _encode_state(state: Any) -> Any:
+    """
+    Converts the individuals of a text to JSON, with sets as sorted lists
+
+    Args:
+        state: Masking state of a text (individuals by person) or None
+
+    Returns:
+        A JSON serializable version of the state
+
+    """
+    if state is None:
+        return None
+    return {
+        str(person): {ent_type: sorted(aliases) for ent_type, aliases in ents.items()}
+        for person, ents in state.items()
+    }
+
+
+def _decode_state(state: Any) -> Any:
+    """
+    Converts a state written by _encode_state back to individuals
+
+    Args:
+        state: The JSON version of the state
+
+    Returns:
+        The masking state of a text
+
+    """
+    if state is None:
+        return None
+    return {
+        int(person): {ent_type: set(aliases) for ent_type, aliases in ents.items()}
+        for person, ents in state.items()
+    }
+
+
+class CorpusCheckpoint(object):
+    """
+    Directory of completed batches of a corpus masking job. Each batch of texts is written
+    atomically with its masked texts and the individuals identified in it, so a job
+    restarted after a crash or preemption skips the batches already done. A manifest
+    records the settings of the job, and resuming with other settings is refused
+
+    Args:
+        directory: Directory holding the checkpoint (created if missing)
+        n_texts: Number of texts in the corpus
+        batch_size: Number of texts per checkpointed batch
+        settings: Settings changing the masked output, compared when resuming
+
+    """
+
+    def __init__(
+        self, directory: str, n_texts: int, batch_size: int, settings: Dict[str, Any]
+    ):
+        super(CorpusCheckpoint, self).__init__()
+        self.directory = directory
+        self.n_texts = n_texts
+        self.batch_size = max(batch_size, 1)
+        os.makedirs(directory, exist_ok=True)
+
+        manifest = {
+            "n_texts": n_texts,
+            "batch_size": self.batch_size,
+            "settings": settings,
+        }
+        manifest_path = os.path.join(directory, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing != json.loads(json.dumps(manifest)):
+                raise ValueError(
+                    f"Checkpoint in {directory} was written by a job with other "
+                    "settings, use a new directory"
+                )
+        else:
+            write_json_atomic(manifest_path, manifest)
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """
+        Splits the corpus into the batches of the job
+
+        Returns:
+            A list of (start, end) indices of each batch
+
+        """
+        return [
+            (start, min(start + self.batch_size, self.n_texts))
+            for start in range(0, self.n_texts, self.batch_size)
+        ]
+
+    def _batch_path(self, start: int, end: int) -> str:
+        return os.path.join(self.directory, f"batch-{start:010d}-{end:010d}.json")
+
+    @staticmethod
+    def digest(texts: List[str]) -> str:
+        """
+        Hashes the input texts of a batch, so changed input is masked again
+
+        Args:
+            texts: The texts of the batch
+
+        Returns:
+            A hex digest of the texts
+
+        """
+        digest = hashlib.sha256()
+        for text in texts:
+            digest.update(text.encode("utf-8", "surrogatepass"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def is_done(self, start: int, end: int) -> bool:
+        """
+        Checks whether a batch has been written
+
+        Args:
+            start: Index of the first text of the batch
+            end: Index after the last text of the batch
+
+        Returns:
+            Whether the batch is in the checkpoint
+
+        """
+        return os.path.exists(self._batch_path(start, end))
+
+    def load(
+        self, start: int, end: int, texts: List[str]
+    ) -> Optional[Tuple[List[str], States]]:
+        """
+        Reads a completed batch
+
+        Args:
+            start: Index of the first text of the batch
+            end: Index after the last text of the batch
+            texts: The input texts of the batch
+
+        Returns:
+            The masked texts and the masking state of each text, or None if the batch
+            has not been written or its input texts have changed
+
+        """
+        path = self._batch_path(start, end)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            batch = json.load(f)
+        if batch["digest"] != self.digest(texts):
+            logging.warning(
+                f"Texts {start} to {end} changed since they were checkpointed, "
+                "masking them again"
+            )
+            return None
+        states = {int(index): _decode_state(x) for index, x in batch["states"].items()}
+        return batch["masked"], states
+
+    def save(
+        self,
+        start: int,
+        end: int,
+        texts: List[str],
+        masked: List[str],
+        states: States,
+    ) -> None:
+        """
+        Writes a completed batch atomically
+
+        Args:
+            start: Index of the first text of the batch
+            end: Index after the last text of the batch
+            texts: The input texts of the batch
+            masked: The masked texts of the batch
+            states: The masking state of each text of the batch
+
+        Returns:
+            None
+
+        """
+        write_json_atomic(
+            self._batch_path(start, end),
+            {
+                "start": start,
+                "end": end,
+                "digest": self.digest(texts),
+                "masked": masked,
+                "states": {
+                    str(index): _encode_state(x)
+                    for index, x in states.items()
+                    if x is not None
+                },
+            },
+        )
+
+    @property
+    def identity_path(self) -> str:
+        return os.path.join(self.directory, "identity.json")
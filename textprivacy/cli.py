@@ -1,16 +1,210 @@
 """Console script for textprivacy."""
+from typing import Iterator, Tuple, Any, TextIO, Deque, List, Optional
+from collections import deque
 import argparse
+import csv
+import json
+import logging
+import os
 import sys
 
-from textprivacy import TextAnonymizer, TextPseudonymizer
+from textprivacy import TextAnonymizer, TextPseudonymizer, MaskingStats
+from textprivacy.models import SUPPORTED_SIZES
+from textprivacy.textanonymization import num_cpus
 
+FORMATS = ["jsonl", "csv", "text", "parquet"]
 
-def main():
+
+def guess_format(path: str) -> str:
     """
-    Commandline version of TextPrivacy
+    Guesses the format of an input file from its extension
+
+    Args:
+        path: Path of the input file ("-" for stdin)
+
+    Returns:
+        One of jsonl, csv, parquet or text
+
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in [".jsonl", ".ndjson"]:
+        return "jsonl"
+    elif extension == ".csv":
+        return "csv"
+    elif extension in [".parquet", ".pq"] or os.path.isdir(path):
+        return "parquet"
+    return "text"
+
+
+def read_records(
+    stream: TextIO, fmt: str, text_field: str, column: str
+) -> Iterator[Tuple[Any, Optional[str]]]:
+    """
+    Lazily reads records and the text to mask from each of them
+
+    Args:
+        stream: The input stream
+        fmt: Format of the input (jsonl, csv or text)
+        text_field: Field holding the text of JSONL records
+        column: Column holding the text of CSV rows
+
+    Returns:
+        An iterator of records and their texts
+
+    """
+    if fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                record = json.loads(line)
+                yield record, record.get(text_field)
+    elif fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield row, row.get(column)
+    else:
+        for line in stream:
+            line = line.rstrip("\r\n")
+            yield line, line
+
+
+def substitute_text(
+    record: Any, masked: str, fmt: str, text_field: str, column: str
+) -> Any:
+    """
+    Replaces the text of a record by the masked text
+
+    Args:
+        record: The record as read from the input
+        masked: The masked text
+        fmt: Format of the record (jsonl, csv or text)
+        text_field: Field holding the text of JSONL records
+        column: Column holding the text of CSV rows
+
+    Returns:
+        The masked record
+
+    """
+    if fmt == "jsonl":
+        if isinstance(record.get(text_field), str):
+            record[text_field] = masked
+        return record
+    elif fmt == "csv":
+        if isinstance(record.get(column), str):
+            record[column] = masked
+        return record
+    return masked
+
+
+class RecordWriter(object):
+    """
+    Writes masked records in the format they were read in
+
+    Args:
+        stream: The output stream
+        fmt: Format of the output (jsonl, csv or text)
+        text_field: Field holding the text of JSONL records
+        column: Column holding the text of CSV rows
+
+    """
+
+    def __init__(self, stream: TextIO, fmt: str, text_field: str, column: str):
+        super(RecordWriter, self).__init__()
+        self.stream = stream
+        self.fmt = fmt
+        self.text_field = text_field
+        self.column = column
+        self._csv_writer: Optional[csv.DictWriter] = None
+
+    def write_record(self, record: Any) -> None:
+        """
+        Writes a masked record
+
+        Args:
+            record: The masked record
+
+        Returns:
+            None
+
+        """
+        if self.fmt == "jsonl":
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif self.fmt == "csv":
+            if self._csv_writer is None:
+                self._csv_writer = csv.DictWriter(self.stream, fieldnames=list(record))
+                self._csv_writer.writeheader()
+            self._csv_writer.writerow(record)
+        else:
+            self.stream.write(record + "\n")
+
+    def write(self, record: Any, masked: str) -> None:
+        """
+        Writes a record with its text replaced by the masked text
+
+        Args:
+            record: The record as read from the input
+            masked: The masked text
+
+        Returns:
+            None
+
+        """
+        self.write_record(
+            substitute_text(record, masked, self.fmt, self.text_field, self.column)
+        )
+
+
+def mask_file(
+    mask_transformer: TextAnonymizer,
+    source: TextIO,
+    target: TextIO,
+    fmt: str,
+    text_field: str = "text",
+    column: str = "text",
+    **kwargs: Any,
+) -> int:
+    """
+    Masks a stream of records, writing each masked record as soon as it is done
+
+    Args:
+        mask_transformer: The TextAnonymizer or TextPseudonymizer to mask with
+        source: The input stream
+        target: The output stream
+        fmt: Format of the input and output (jsonl, csv or text)
+        text_field: Field holding the text of JSONL records
+        column: Column holding the text of CSV rows
+        kwargs: Keyword arguments passed on to mask_stream
+
+    Returns:
+        The number of records written
+
+    """
+    pending: Deque[Any] = deque()
+
+    def texts() -> Iterator[str]:
+        for record, text in read_records(source, fmt, text_field, column):
+            pending.append(record)
+            # records without a text are written unchanged
+            yield text if isinstance(text, str) else ""
+
+    writer = RecordWriter(target, fmt, text_field, column)
+    n_records = 0
+    for masked in mask_transformer.mask_stream(texts(), **kwargs):
+        writer.write(pending.popleft(), masked)
+        n_records += 1
+    target.flush()
+    return n_records
+
+
+def add_masking_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the options shared by all commands for choosing how texts are masked
+
+    Args:
+        parser: The parser of a command
+
+    Returns:
+        None
+
     """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("input", type=str, default=None, help="Text to be masked")
     parser.add_argument(
         "-m",
         "--masking",
@@ -21,15 +215,413 @@ def main():
         choices=["pseudonymizer", "anonymizer"],
         help="Masking technique to apply",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--batch-size", type=int, default=8, help="Batch size used for DaCy"
+    )
+    parser.add_argument(
+        "--n-process", type=int, default=num_cpus, help="Number of processes"
+    )
+    parser.add_argument(
+        "--masking-order",
+        type=str,
+        default="CPR,TELEFON,EMAIL,NER",
+        help="Comma separated order of the masking methods",
+    )
+    parser.add_argument(
+        "--mask-misc", action="store_true", help="Mask miscellaneous entities"
+    )
+    parser.add_argument("--mask-numbers", action="store_true", help="Mask numbers")
+    parser.add_argument(
+        "--epsilon",
+        type=float,
+        default=None,
+        help="Add laplace noise of this epsilon to numbers instead of masking them",
+    )
+    parser.add_argument(
+        "--loglevel", type=str, default="WARNING", help="Logging level (to stderr)"
+    )
+
+
+def build_transformer(
+    args: argparse.Namespace, corpus: List[str] = [], **kwargs: Any
+) -> Tuple[TextAnonymizer, List[str]]:
+    """
+    Creates the masking object and the masking order chosen on the command line
+
+    Args:
+        args: Parsed command line arguments
+        corpus: The corpus to mask
+        kwargs: Further keyword arguments for TextAnonymizer or TextPseudonymizer
 
+    Returns:
+        A tuple of the TextAnonymizer or TextPseudonymizer and the masking order
+
+    """
+    settings = dict(
+        mask_misc=args.mask_misc,
+        mask_numbers=args.mask_numbers,
+        epsilon=args.epsilon,
+        **kwargs,
+    )
     if args.masking == "anonymizer":
-        mask_transformer = TextAnonymizer([args.input])
+        mask_transformer = TextAnonymizer(corpus, **settings)
+    else:
+        mask_transformer = TextPseudonymizer(corpus, **settings)
+
+    masking_order = [x.strip() for x in args.masking_order.split(",") if x.strip()]
+    return mask_transformer, masking_order
+
+
+def serve(argv: List[str]) -> None:
+    """
+    Runs the HTTP masking service until interrupted
+
+    Args:
+        argv: Command line arguments after "serve"
+
+    Returns:
+        None
+
+    """
+    from textprivacy.executor import NERExecutor
+    from textprivacy.server import MaskingService, make_server
+
+    parser = argparse.ArgumentParser(prog="textprivacy serve")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host")
+    parser.add_argument("--port", type=int, default=8000, help="Port")
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=32,
+        help="Maximum number of texts masked together",
+    )
+    parser.add_argument(
+        "--max-latency-ms",
+        type=float,
+        default=10.0,
+        help="Milliseconds to wait for more texts before masking a batch",
+    )
+    parser.add_argument(
+        "--model-size",
+        type=str,
+        default="large",
+        choices=SUPPORTED_SIZES,
+        help="Size of the DaCy model",
+    )
+    add_masking_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        format="%(asctime)s - %(levelname)s: %(message)s",
+        level=getattr(logging, args.loglevel.upper(), None),
+    )
+    executor = None
+    if "NER" in args.masking_order.split(","):
+        # load the model and start the workers once, before accepting requests
+        executor = NERExecutor(args.model_size, args.n_process).start()
+    mask_transformer, masking_order = build_transformer(
+        args, model_size=args.model_size, executor=executor
+    )
+
+    service = MaskingService(
+        mask_transformer,
+        masking_order,
+        batch_size=args.batch_size,
+        n_process=args.n_process,
+        max_batch_size=args.max_batch_size,
+        max_latency=args.max_latency_ms / 1000,
+    )
+    server = make_server(service, args.host, args.port)
+    logging.warning(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if executor is not None:
+            executor.close()
+
+
+def merge(argv: List[str]) -> None:
+    """
+    Reassembles the parts written by sharded runs in the original order of the input
+
+    Args:
+        argv: Command line arguments after "merge"
+
+    Returns:
+        None
+
+    """
+    from textprivacy.sharding import merge_shards, read_manifests
+
+    parser = argparse.ArgumentParser(prog="textprivacy merge")
+    parser.add_argument("directory", type=str, help="Directory of the shard parts")
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        type=str,
+        default="-",
+        help="File to write the merged records to (default is stdout)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        fmt = read_manifests(args.directory)[0]["format"]
+    except (ValueError, OSError) as error:
+        sys.exit(f"textprivacy merge: {error}")
+
+    newline = "" if fmt == "csv" else None
+    if args.output_file == "-":
+        target = sys.stdout
+    else:
+        # merge into a temporary file, so a failed merge leaves no partial output
+        target = open(args.output_file + ".tmp", "w", encoding="utf-8", newline=newline)
+
+    writer = RecordWriter(target, fmt, "text", "text")
+    try:
+        for record in merge_shards(args.directory):
+            writer.write_record(record)
+        target.flush()
+    except (ValueError, OSError) as error:
+        if target is not sys.stdout:
+            target.close()
+            os.remove(args.output_file + ".tmp")
+        sys.exit(f"textprivacy merge: {error}")
+
+    if target is not sys.stdout:
+        target.close()
+        os.replace(args.output_file + ".tmp", args.output_file)
+
+
+def shard_key(record: Any, field: str) -> Any:
+    """
+    Looks up the key to shard a record by
+
+    Args:
+        record: A JSONL record or CSV row
+        field: Field or column holding the key
+
+    Returns:
+        The key of the record
+
+    """
+    value = record.get(field) if isinstance(record, dict) else None
+    if value is None:
+        raise ValueError(f"Record without the shard key '{field}': {record}")
+    return value
+
+
+def main():
+    """
+    Commandline version of TextPrivacy
+    """
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["merge"]:
+        merge(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        epilog="Run 'textprivacy serve --help' for the HTTP masking service and "
+        "'textprivacy merge --help' for merging sharded runs"
+    )
+    parser.add_argument(
+        "input", type=str, nargs="?", default=None, help="Text to be masked"
+    )
+    parser.add_argument(
+        "-i",
+        "--input-file",
+        type=str,
+        default=None,
+        help="File of texts to mask, or - to read from stdin",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        type=str,
+        default="-",
+        help="File to write the masked texts to (default is stdout)",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        type=str,
+        default=None,
+        choices=FORMATS,
+        help="Format of the input file (default is guessed from its extension)",
+    )
+    parser.add_argument(
+        "--text-field", type=str, default="text", help="Text field of JSONL records"
+    )
+    parser.add_argument(
+        "--column",
+        type=str,
+        default="text",
+        help="Text column of CSV and Parquet files",
+    )
+    parser.add_argument(
+        "--rows-per-batch",
+        type=int,
+        default=1024,
+        help="Rows of Parquet files read and masked at a time",
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="Mask only shard i of N (given as i/N, from 0/N to N-1/N) and write "
+        "it as a part with a manifest to the directory given by -o",
+    )
+    parser.add_argument(
+        "--shard-key",
+        type=str,
+        default=None,
+        help="Field or column to shard JSONL and CSV records by (default is by index)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print the time spent in each stage, throughput and entity counts "
+        "as JSON to stderr",
+    )
+    add_masking_arguments(parser)
+    args = parser.parse_args()
+
+    if args.input is None and args.input_file is None:
+        parser.error("either a text or --input-file is required")
+
+    corpus = [args.input] if args.input is not None else []
+    mask_transformer, masking_order = build_transformer(args, corpus)
+    stats = MaskingStats() if args.stats else None
+    _mask_input(parser, args, mask_transformer, masking_order, stats)
+    if stats is not None:
+        print(json.dumps(stats.to_dict()), file=sys.stderr)
+
+
+def _mask_input(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    mask_transformer: TextAnonymizer,
+    masking_order: List[str],
+    stats: MaskingStats = None,
+) -> None:
+    """
+    Masks the text or input file given on the command line
+
+    Args:
+        parser: The parser of the command line, for reporting errors
+        args: Parsed command line arguments
+        mask_transformer: The TextAnonymizer or TextPseudonymizer to mask with
+        masking_order: The order of applying masking functions
+        stats: A MaskingStats collecting statistics of the run
+
+    Returns:
+        None
+
+    """
+    if args.input_file is None:
+        masked_corpus = mask_transformer.mask_corpus(
+            masking_order=masking_order,
+            batch_size=args.batch_size,
+            n_process=args.n_process,
+            loglevel=args.loglevel,
+            stats=stats,
+        )
+        print(masked_corpus[-1])
+        return
+
+    fmt = args.format or guess_format(args.input_file)
+    if fmt == "parquet":
+        from textprivacy.columnar import mask_parquet
+
+        if "-" in [args.input_file, args.output_file]:
+            parser.error("Parquet is read from and written to files, not stdin/stdout")
+        if args.shard is not None:
+            parser.error("--shard is not supported for Parquet")
+        mask_parquet(
+            mask_transformer,
+            args.input_file,
+            args.output_file,
+            column=args.column,
+            rows_per_batch=args.rows_per_batch,
+            masking_order=masking_order,
+            batch_size=args.batch_size,
+            n_process=args.n_process,
+            loglevel=args.loglevel,
+            stats=stats,
+        )
+        return
+
+    newline = "" if fmt == "csv" else None
+    if args.shard is not None:
+        from textprivacy.sharding import mask_shard, parse_shard
+
+        try:
+            shard, n_shards = parse_shard(args.shard)
+        except ValueError as error:
+            parser.error(str(error))
+        if args.output_file == "-":
+            parser.error("--shard requires -o with the directory to write parts to")
+        if args.shard_key is not None and fmt == "text":
+            parser.error("--shard-key requires JSONL or CSV records")
+    if args.input_file == "-":
+        source = sys.stdin
+    else:
+        source = open(args.input_file, encoding="utf-8", newline=newline)
+    settings = dict(
+        masking_order=masking_order,
+        batch_size=args.batch_size,
+        n_process=args.n_process,
+        loglevel=args.loglevel,
+        stats=stats,
+    )
+    if args.shard is not None:
+        key = None
+        if args.shard_key is not None:
+            key = lambda record: shard_key(record, args.shard_key)  # noqa: E731
+        try:
+            mask_shard(
+                mask_transformer,
+                read_records(source, fmt, args.text_field, args.column),
+                args.output_file,
+                shard,
+                n_shards,
+                key=key,
+                substitute=lambda record, masked: substitute_text(
+                    record, masked, fmt, args.text_field, args.column
+                ),
+                fmt=fmt,
+                **settings,
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        return
+
+    if args.output_file == "-":
+        target = sys.stdout
     else:
-        mask_transformer = TextPseudonymizer([args.input])
+        target = open(args.output_file, "w", encoding="utf-8", newline=newline)
 
-    masked_corpus = mask_transformer.mask_corpus()
-    print(masked_corpus[-1])
+    try:
+        mask_file(
+            mask_transformer,
+            source,
+            target,
+            fmt,
+            text_field=args.text_field,
+            column=args.column,
+            **settings,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+"""Masking text columns of Arrow tables and Parquet files one record batch at a time."""
+
+from typing import Any, Deque, Iterable, Iterator, List, Tuple, Union
+from collections import deque
+import os
+
+from textprivacy.textanonymization import TextAnonymizer
+
+
+def _import_pyarrow() -> Any:
+    """
+    Imports pyarrow, which is only needed for columnar input and output
+
+    Returns:
+        The pyarrow module
+
+    """
+    try:
+        import pyarrow  # type: ignore
+    except ImportError as error:
+        raise ImportError(
+            "Reading and writing Arrow and Parquet requires pyarrow, "
+            "install it with: pip install pyarrow"
+        ) from error
+    return pyarrow
+
+
+def read_record_batches(
+    source: Any, rows_per_batch: int = 1024
+) -> Tuple[Any, Iterator]:
+    """
+    Lazily reads record batches from a Parquet file, a directory of Parquet files, an Arrow
+    IPC (Feather) file or an in-memory Arrow table. Files are memory-mapped, so only the
+    batches being masked are held in memory
+
+    Args:
+        source: Path of the input, a pyarrow Table or a pyarrow RecordBatchReader
+        rows_per_batch: Maximum number of rows of each record batch
+
+    Returns:
+        A tuple of the schema and an iterator of record batches
+
+    """
+    pa = _import_pyarrow()
+
+    if isinstance(source, pa.Table):
+        return source.schema, iter(source.to_batches(max_chunksize=rows_per_batch))
+    if isinstance(source, pa.RecordBatchReader):
+        return source.schema, iter(source)
+
+    path = os.fspath(source)
+    if os.path.isdir(path):
+        import pyarrow.dataset  # type: ignore
+
+        dataset = pyarrow.dataset.dataset(path, format="parquet")
+        return dataset.schema, dataset.to_batches(batch_size=rows_per_batch)
+
+    if os.path.splitext(path)[1].lower() in [".arrow", ".feather", ".ipc"]:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        batches = (
+            part
+            for i in range(reader.num_record_batches)
+            for part in pa.Table.from_batches(
+                [reader.get_batch(i)], reader.schema
+            ).to_batches(max_chunksize=rows_per_batch)
+        )
+        return reader.schema, batches
+
+    import pyarrow.parquet  # type: ignore
+
+    parquet_file = pyarrow.parquet.ParquetFile(path, memory_map=True)
+    return (
+        parquet_file.schema_arrow,
+        parquet_file.iter_batches(batch_size=rows_per_batch),
+    )
+
+
+def _replace_column(pa: Any, batch: Any, column: str, masked: List[str]) -> Any:
+    """
+    Builds a record batch with a column replaced by the masked texts, sharing the buffers
+    of all other columns
+
+    Args:
+        pa: The pyarrow module
+        batch: The record batch read
+        column: Name of the text column
+        masked: The masked texts of the batch
+
+    Returns:
+        The masked record batch
+
+    """
+    i = batch.schema.get_field_index(column)
+    original = batch.column(i)
+    nulls = None
+    if original.null_count:
+        nulls = original.is_null().to_numpy(zero_copy_only=False)
+    arrays = list(batch.columns)
+    arrays[i] = pa.array(masked, type=original.type, mask=nulls)
+    return pa.RecordBatch.from_arrays(arrays, schema=batch.schema)
+
+
+def mask_record_batches(
+    mask_transformer: TextAnonymizer,
+    batches: Iterable[Any],
+    column: str = "text",
+    **kwargs: Any,
+) -> Iterator[Any]:
+    """
+    Masks a text column of a stream of record batches, carrying the other columns through
+    untouched. Rows are indexed by their position in the stream, which is the index used
+    in individuals, and null texts stay null
+
+    Args:
+        mask_transformer: The TextAnonymizer or TextPseudonymizer to mask with
+        batches: Iterable of pyarrow RecordBatches
+        column: Name of the text column to mask
+        kwargs: Keyword arguments passed on to mask_stream
+
+    Returns:
+        An iterator of record batches with the text column masked
+
+    """
+    pa = _import_pyarrow()
+    pending: Deque[Any] = deque()
+
+    def texts() -> Iterator[Tuple[int, str]]:
+        position = 0
+        for batch in batches:
+            column_type = batch.schema.field(column).type
+            if not pa.types.is_string(column_type) and not pa.types.is_large_string(
+                column_type
+            ):
+                raise ValueError(
+                    f"Column '{column}' must hold strings, found {column_type}"
+                )
+            pending.append(batch)
+            for text in batch.column(column).to_pylist():
+                # null texts are masked as empty texts and restored as nulls
+                yield position, text if text is not None else ""
+                position += 1
+
+    masked: List[str] = []
+    for text in mask_transformer.mask_stream(texts(), **kwargs):
+        masked.append(text)
+        while pending and len(masked) >= pending[0].num_rows:
+            batch = pending.popleft()
+            yield _replace_column(pa, batch, column, masked[: batch.num_rows])
+            masked = masked[batch.num_rows :]
+
+    # batches without rows after the last text
+    while pending:
+        yield pending.popleft()
+
+
+def mask_table(
+    mask_transformer: TextAnonymizer,
+    table: Any,
+    column: str = "text",
+    rows_per_batch: int = 1024,
+    **kwargs: Any,
+) -> Any:
+    """
+    Masks a text column of an Arrow table
+
+    Args:
+        mask_transformer: The TextAnonymizer or TextPseudonymizer to mask with
+        table: The pyarrow Table
+        column: Name of the text column to mask
+        rows_per_batch: Maximum number of rows masked at a time
+        kwargs: Keyword arguments passed on to mask_stream
+
+    Returns:
+        A pyarrow Table with the text column masked
+
+    """
+    pa = _import_pyarrow()
+    schema, batches = read_record_batches(table, rows_per_batch)
+    kwargs.setdefault("chunk_size", rows_per_batch)
+    return pa.Table.from_batches(
+        list(mask_record_batches(mask_transformer, batches, column, **kwargs)), schema
+    )
+
+
+def mask_parquet(
+    mask_transformer: TextAnonymizer,
+    source: Any,
+    target: Union[str, os.PathLike],
+    column: str = "text",
+    rows_per_batch: int = 1024,
+    **kwargs: Any,
+) -> int:
+    """
+    Masks a text column of a Parquet file, Parquet dataset directory or Arrow IPC file and
+    writes the result as Parquet one record batch at a time, so memory use is bounded by
+    the record batches being masked
+
+    Args:
+        mask_transformer: The TextAnonymizer or TextPseudonymizer to mask with
+        source: Path of the input, or a pyarrow Table or RecordBatchReader
+        target: Path of the Parquet file to write
+        column: Name of the text column to mask
+        rows_per_batch: Maximum number of rows read at a time
+        kwargs: Keyword arguments passed on to mask_stream
+
+    Returns:
+        The number of rows written
+
+    """
+    _import_pyarrow()
+    import pyarrow.parquet  # type: ignore
+
+    schema, batches = read_record_batches(source, rows_per_batch)
+    if column not in schema.names:
+        raise ValueError(f"Column '{column}' not found, columns are: {schema.names}")
+
+    kwargs.setdefault("chunk_size", rows_per_batch)
+    n_rows = 0
+    with pyarrow.parquet.ParquetWriter(target, schema) as writer:
+        for batch in mask_record_batches(mask_transformer, batches, column, **kwargs):
+            writer.write_batch(batch)
+            n_rows += batch.num_rows
+    return n_rows
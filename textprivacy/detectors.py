@@ -0,0 +1,115 @@
+"""Precompiled regex detectors for identifiable information."""
+
+from typing import List, Dict, Set, Union, Tuple, Pattern
+
+import re
+
+from textprivacy.utils import EntitySpan, find_entity_spans, resolve_overlaps
+
+CPR_PATTERN = re.compile(
+    "|".join([r"[0-3]\d{1}[0-1]\d{3}-\d{4}", r"[0-3]\d{1}[0-1]\d{3} \d{4}"])
+)
+
+TELEFON_PATTERN = re.compile(
+    "|".join(
+        [
+            r"\+\d{10}",
+            r"\+\d{4} \d{2} \d{2} \d{2}",
+            r"\+\d{2} \d{8}",
+            r"\+\d{2} \d{2} \d{2} \d{2} \d{2}",
+            r"\+\d{2} \d{4} \d{4}",
+            r"\d{2} \d{4} \d{4}",
+            r"\d{2} \d{4}\-\d{4}",
+            r"\d{8}",
+            r"\d{4} \d{4}",
+            r"\d{4}\-\d{4}",
+            r"\d{2} \d{2} \d{2} \d{2}",
+        ]
+    )
+)
+
+EMAIL_PATTERN = re.compile(r"[\w\.-]+@[\w\.-]+(?:\.[\w]+)+")
+
+# Detectors available by name in masking_order
+DETECTORS: Dict[str, Pattern] = {
+    "CPR": CPR_PATTERN,
+    "TELEFON": TELEFON_PATTERN,
+    "EMAIL": EMAIL_PATTERN,
+}
+
+
+def register_detector(name: str, pattern: Union[str, Pattern]) -> Pattern:
+    """
+    Registers a regex detector which can be used by name in masking_order.
+    Remember to add a placeholder for the name to the mapping of the masking object
+
+    Args:
+        name: Name of the entity type found by the detector (e.g. CVR)
+        pattern: Regex as a string or compiled pattern
+
+    Returns:
+        The compiled pattern
+
+    """
+    compiled = re.compile(pattern) if isinstance(pattern, str) else pattern
+    DETECTORS[name] = compiled
+    return compiled
+
+
+def find_matches(text: str, pattern: Pattern) -> Set[str]:
+    """
+    Finds the distinct matches of a precompiled detector in a text
+
+    Args:
+        text: Text to find entities in
+        pattern: The compiled pattern of the detector
+
+    Returns:
+        A set of the matched entities
+
+    """
+    return {match.group() for match in pattern.finditer(text) if match.group()}
+
+
+def scan(text: str, detectors: List[Tuple[str, Pattern]]) -> List[EntitySpan]:
+    """
+    Runs the detectors over a text in order of priority with their offsets, as if the
+    matches of each detector were masked before the next detector runs. Matches within a
+    larger word or number are skipped, and later detectors only see the text left
+    unmatched by earlier ones
+
+    Args:
+        text: Text to find entities in
+        detectors: List of detector names and compiled patterns in order of priority
+
+    Returns:
+        A list of non-overlapping typed entity matches in order of appearance
+
+    """
+    kept: List[Tuple[int, int, int, str, str]] = []
+    view = text
+    for priority, (label, pattern) in enumerate(detectors):
+        # every occurrence of a match is masked, as when masking the entity strings
+        entities = find_matches(view, pattern)
+        found = [
+            (priority, start, end, label, text[start:end])
+            for start, end, _ in find_entity_spans(
+                view, dict.fromkeys(entities, "\x00")
+            )
+        ]
+        if not found:
+            continue
+        kept = resolve_overlaps(kept + found)
+        # later detectors see matched text as a placeholder, which is not a word
+        pieces = []
+        position = 0
+        for _, start, end, _, _ in kept:
+            pieces.append(text[position:start])
+            pieces.append("\x00" * (end - start))
+            position = end
+        pieces.append(text[position:])
+        view = "".join(pieces)
+
+    return [
+        EntitySpan(label, entity, start, end) for _, start, end, label, entity in kept
+    ]
@@ -0,0 +1,218 @@
+"""Long-lived pool of DaCy workers for named entity recognition."""
+
+from typing import List, Tuple, Optional
+import os
+import logging
+import multiprocessing
+import multiprocessing.pool
+
+from textprivacy.models import get_model
+from textprivacy.utils import EntitySpan, token_batches
+
+num_cpus: int = int(os.cpu_count())  # type: ignore
+
+
+def compact_doc(doc, with_numbers: bool) -> List[EntitySpan]:  # type: ignore
+    """
+    Reduces a spaCy Doc to the entity spans and number tokens needed for masking
+
+    Args:
+        doc: A spaCy Doc processed by DaCy
+        with_numbers: Whether to include tokens tagged as numbers (labelled NUM)
+
+    Returns:
+        A list of entity spans
+
+    """
+    spans = [
+        EntitySpan(ent.label_, ent.text, ent.start_char, ent.end_char)
+        for ent in doc.ents
+    ]
+    if with_numbers:
+        # get numbers from part of speech tags
+        for token in doc:
+            # ensure the number isn't in another NER token
+            digits = len([x for x in token.text if x.isdigit()])
+            if token.tag_ == "NUM" and not token.ent_type_ and digits > 0:
+                spans.append(
+                    EntitySpan("NUM", token.text, token.idx, token.idx + len(token))
+                )
+    return spans
+
+
+def worker(args: Tuple[str, List[str], bool]):  # type: ignore
+    model_size, text, with_numbers = args
+    docs = get_model(model_size).pipe(text, batch_size=len(text))
+    return [compact_doc(doc, with_numbers) for doc in docs]
+
+
+def batch_indices(
+    texts: List[str], batch_size: int, max_batch_tokens: int = None
+) -> List[List[int]]:
+    """
+    Splits texts into batches of indices, either by count or by a token budget
+
+    Args:
+        texts: Texts to split into batches
+        batch_size: Number of texts in a batch when batching by count
+        max_batch_tokens: Maximum number of padded tokens in a batch, batching texts by length
+
+    Returns:
+        A list of batches of text indices
+
+    """
+    if max_batch_tokens:
+        return token_batches(texts, max_batch_tokens)
+    return [
+        list(range(pos, min(pos + batch_size, len(texts))))
+        for pos in range(0, len(texts), batch_size)
+    ]
+
+
+def _init_worker(model_size: str, threads: int) -> None:
+    """
+    Pins the torch threads of a worker and warms up its model
+
+    Args:
+        model_size: Size of the DaCy model
+        threads: Number of torch threads for the worker
+
+    Returns:
+        None
+
+    """
+    import torch
+
+    torch.set_num_threads(threads)
+    list(get_model(model_size).pipe(["Opvarmning af modellen."]))
+
+
+class NERExecutor(object):
+    """
+    Pool of NER workers which is kept alive across calls to mask_corpus. Use it as a
+    context manager or attach it to a TextAnonymizer/TextPseudonymizer and close it when done.
+    Workers are started on the first prediction or by calling start
+
+    Args:
+        model_size: Size of the DaCy model ("small", "medium" or "large")
+        n_process: Number of worker processes
+        threads_per_worker: Torch threads of each worker (default splits the CPU cores evenly)
+
+    """
+
+    def __init__(
+        self,
+        model_size: str = "large",
+        n_process: int = num_cpus,
+        threads_per_worker: int = None,
+    ):
+        super(NERExecutor, self).__init__()
+        self.model_size = model_size
+        self.n_process = max(n_process, 1)
+        self.threads_per_worker = threads_per_worker or max(
+            num_cpus // self.n_process, 1
+        )
+        self.batches_processed = 0
+        self._pool: Optional[multiprocessing.pool.Pool] = None
+        self._closed = False
+
+    def start(self) -> "NERExecutor":
+        """
+        Starts the workers if they are not running yet
+
+        Returns:
+            The executor itself
+
+        """
+        if self._closed:
+            raise RuntimeError("NERExecutor has been shut down")
+
+        if self._pool is None:
+            # load in the parent process so forked workers share the cached model
+            get_model(self.model_size)
+            logging.info(
+                f"Starting {self.n_process} NER workers with "
+                f"{self.threads_per_worker} threads each"
+            )
+            self._pool = multiprocessing.Pool(
+                self.n_process,
+                initializer=_init_worker,
+                initargs=(self.model_size, self.threads_per_worker),
+            )
+        return self
+
+    def predict(
+        self,
+        texts: List[str],
+        batch_size: int,
+        with_numbers: bool,
+        max_batch_tokens: int = None,
+    ) -> List[List[EntitySpan]]:
+        """
+        Runs NER on texts across the workers
+
+        Args:
+            texts: Texts to run the model on
+            batch_size: Number of texts to include in a batch
+            with_numbers: Whether to include tokens tagged as numbers
+            max_batch_tokens: Batch texts of similar length up to this many padded tokens instead of by count
+
+        Returns:
+            A list of entity spans for each text in order
+
+        """
+        self.start()
+        groups = batch_indices(texts, batch_size, max_batch_tokens)
+        batches = [
+            (self.model_size, [texts[i] for i in group], with_numbers)
+            for group in groups
+        ]
+        # length sorted batches are sent one at a time to spread long texts over the workers
+        chunksize = 1 if max_batch_tokens else None
+        results = self._pool.map(worker, batches, chunksize)  # type: ignore
+        self.batches_processed += len(batches)
+
+        spans: List[List[EntitySpan]] = [[] for _ in texts]
+        for group, result in zip(groups, results):
+            for i, text_spans in zip(group, result):
+                spans[i] = text_spans
+        return spans
+
+    def close(self) -> None:
+        """
+        Lets the workers finish their current tasks and shuts them down
+
+        Returns:
+            None
+
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._closed = True
+
+    def terminate(self) -> None:
+        """
+        Stops the workers immediately
+
+        Returns:
+            None
+
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._closed = True
+
+    def __enter__(self) -> "NERExecutor":
+        if self._closed:
+            raise RuntimeError("NERExecutor has been shut down")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:  # type: ignore
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
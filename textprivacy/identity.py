@@ -0,0 +1,235 @@
+"""Corpus level table of consistent pseudonym IDs."""
+
+from typing import Dict, Set, Tuple, Optional
+import json
+import logging
+import sys
+import threading
+
+from textprivacy.utils import write_json_atomic
+
+Individuals = Dict[int, Dict[str, Set[str]]]
+
+
+class IdentityTable(object):
+    """
+    Maps normalized entity aliases to pseudonym IDs shared by all texts of a corpus, so
+    "Person 3" is the same individual in every text. Aliases are interned and keyed on
+    their entity type, and IDs are plain integers, keeping the table small. The table can
+    be saved and loaded between runs, and tables from separate runs can be merged
+
+    Args:
+        maxsize: Maximum number of aliases to remember (default is unbounded)
+
+    """
+
+    def __init__(self, maxsize: int = None):
+        super(IdentityTable, self).__init__()
+        self.maxsize = maxsize
+        self.next_id = 1
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._full_warned = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(entity_type: str, alias: str) -> Tuple[str, str]:
+        """
+        Computes the key of an alias, ignoring case, surrounding and repeated whitespace
+        and, for persons, dots
+
+        Args:
+            entity_type: Type of the entity (e.g. PER)
+            alias: The entity as written in the text
+
+        Returns:
+            A tuple of the interned entity type and normalized alias
+
+        """
+        alias = " ".join(alias.lower().split())
+        if entity_type == "PER":
+            alias = alias.replace(".", "")
+        return sys.intern(entity_type), sys.intern(alias)
+
+    def get(self, entity_type: str, alias: str) -> Optional[int]:
+        """
+        Looks up the pseudonym ID of an alias
+
+        Args:
+            entity_type: Type of the entity
+            alias: The entity as written in the text
+
+        Returns:
+            The ID, or None if the alias is unknown
+
+        """
+        return self._ids.get(self.normalize(entity_type, alias))
+
+    def _remember(self, key: Tuple[str, str], identity: int) -> None:
+        if key in self._ids:
+            return
+        if self.maxsize is not None and len(self._ids) >= self.maxsize:
+            if not self._full_warned:
+                logging.warning(
+                    "Identity table is full, new aliases will not be remembered"
+                )
+                self._full_warned = True
+            return
+        self._ids[key] = identity
+
+    def _resolve(self, keys: Dict[str, Set[Tuple[str, str]]]) -> int:
+        """
+        Finds the ID of an individual from its longest aliases of each type, or
+        assigns a new ID, and remembers all of its aliases
+
+        Args:
+            keys: Normalized alias keys of the individual by entity type
+
+        Returns:
+            The pseudonym ID of the individual
+
+        """
+        known: Set[int] = set()
+        for type_keys in keys.values():
+            longest = max((len(alias) for _, alias in type_keys), default=0)
+            known.update(
+                self._ids[key]
+                for key in type_keys
+                if len(key[1]) == longest and key in self._ids
+            )
+
+        if known:
+            identity = min(known)
+        else:
+            identity = self.next_id
+            self.next_id += 1
+
+        for type_keys in keys.values():
+            for key in type_keys:
+                self._remember(key, identity)
+        return identity
+
+    def assign(self, individuals: Individuals) -> Individuals:
+        """
+        Renumbers the individuals of a text with corpus level pseudonym IDs. Individuals
+        mapping to the same ID are merged
+
+        Args:
+            individuals: Individuals of a text and their entities
+
+        Returns:
+            The individuals keyed by their pseudonym IDs
+
+        """
+        assigned: Individuals = {}
+        with self._lock:
+            for person in sorted(individuals):
+                entities = individuals[person]
+                keys = {
+                    entity_type: {self.normalize(entity_type, x) for x in aliases}
+                    for entity_type, aliases in entities.items()
+                    if aliases
+                }
+                if not keys:
+                    continue
+                identity = self._resolve(keys)
+                merged = assigned.setdefault(identity, {})
+                for entity_type, aliases in entities.items():
+                    merged.setdefault(entity_type, set()).update(aliases)
+        return assigned
+
+    def merge(self, other: "IdentityTable") -> Dict[int, int]:
+        """
+        Merges another table into this one, e.g. after separate parallel runs
+
+        Args:
+            other: The table to merge
+
+        Returns:
+            A dictionary mapping the IDs of the other table to IDs of this table
+
+        """
+        grouped: Dict[int, Dict[str, Set[Tuple[str, str]]]] = {}
+        for key, identity in other._ids.items():
+            grouped.setdefault(identity, {}).setdefault(key[0], set()).add(key)
+
+        with self._lock:
+            return {
+                identity: self._resolve(grouped[identity])
+                for identity in sorted(grouped)
+            }
+
+    def to_dict(self) -> dict:
+        """
+        Converts the table to a JSON serializable dictionary
+
+        Returns:
+            A dictionary of the next ID and the aliases of each entity type
+
+        """
+        aliases: Dict[str, Dict[str, int]] = {}
+        for (entity_type, alias), identity in self._ids.items():
+            aliases.setdefault(entity_type, {})[alias] = identity
+        return {"next_id": self.next_id, "aliases": aliases}
+
+    @classmethod
+    def from_dict(cls, data: dict, maxsize: int = None) -> "IdentityTable":
+        """
+        Creates a table from a dictionary made by to_dict
+
+        Args:
+            data: The dictionary of the table
+            maxsize: Maximum number of aliases to remember
+
+        Returns:
+            The identity table
+
+        """
+        table = cls(maxsize=maxsize)
+        for entity_type, aliases in data["aliases"].items():
+            for alias, identity in aliases.items():
+                table._ids[(sys.intern(entity_type), sys.intern(alias))] = identity
+        table.next_id = data["next_id"]
+        return table
+
+    def save(self, path: str) -> None:
+        """
+        Writes the table to a JSON file, replacing it atomically
+
+        Args:
+            path: Path of the JSON file
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            data = self.to_dict()
+        write_json_atomic(path, data)
+
+    @classmethod
+    def load(cls, path: str, maxsize: int = None) -> "IdentityTable":
+        """
+        Reads a table written by save
+
+        Args:
+            path: Path of the JSON file
+            maxsize: Maximum number of aliases to remember
+
+        Returns:
+            The identity table
+
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), maxsize=maxsize)
@@ -0,0 +1,170 @@
+"""Process-wide registry of lazily loaded DaCy models."""
+
+from typing import Dict, Any, Optional
+import logging
+import threading
+import time
+
+SUPPORTED_SIZES = ["small", "medium", "large"]
+
+_models: Dict[str, Any] = {}
+_load_times: Dict[str, float] = {}
+_lock = threading.Lock()
+_device = None
+
+
+def _setup_torch() -> None:
+    """
+    Configures torch and spaCy the first time a model is needed
+
+    Returns:
+        None
+
+    """
+    global _device
+    if _device is not None:
+        return
+
+    import spacy
+    import torch
+
+    spacy.prefer_gpu()
+    # Hack to make DaCy multiprocessable for both spawn and fork (SpaCy 3.0 issue with pickle)
+    torch.set_num_threads(1)
+    _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def get_device() -> Any:
+    """
+    Returns the torch device used for NER, configuring torch if needed
+
+    Returns:
+        The torch device
+
+    """
+    _setup_torch()
+    return _device
+
+
+def get_model(size: str = "large") -> Any:
+    """
+    Fetches a DaCy model, loading it on first use and caching it for the process
+
+    Args:
+        size: Size of the DaCy model ("small", "medium" or "large")
+
+    Returns:
+        The loaded spaCy pipeline
+
+    """
+    model = _models.get(size)
+    if model is not None:
+        return model
+
+    if size not in SUPPORTED_SIZES:
+        raise ValueError(
+            "Unknown DaCy model size '{}', choose one of: {}".format(
+                size, ", ".join(SUPPORTED_SIZES)
+            )
+        )
+
+    with _lock:
+        if size not in _models:
+            _setup_torch()
+            import dacy  # type: ignore
+
+            logging.info(f"Loading DaCy model ({size})...")
+            start = time.perf_counter()
+            _models[size] = dacy.load(size)
+            _load_times[size] = time.perf_counter() - start
+            logging.info(
+                f"Loaded DaCy model ({size}) in {_load_times[size]:.2f} seconds"
+            )
+
+    return _models[size]
+
+
+def register_model(name: str, nlp: Any) -> None:
+    """
+    Registers an already loaded spaCy pipeline under a name, so it can be used as the
+    model_size of TextAnonymizer, TextPseudonymizer or NERExecutor (e.g. a stub model
+    for benchmarks). Register before starting workers, which inherit it when forked
+
+    Args:
+        name: Name to use in place of a DaCy model size
+        nlp: The spaCy pipeline, which must set doc.ents and the NUM tag of numbers
+
+    Returns:
+        None
+
+    """
+    with _lock:
+        _models[name] = nlp
+        _load_times[name] = 0.0
+
+
+def model_id(size: str = "large") -> str:
+    """
+    Identifies a DaCy model by its size and the installed DaCy version without loading it
+
+    Args:
+        size: Size of the DaCy model, or the name of a registered model
+
+    Returns:
+        A string naming the model and its version
+
+    """
+    if size not in SUPPORTED_SIZES:
+        return f"custom-{size}"
+
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        dacy_version = version("dacy")
+    except PackageNotFoundError:
+        dacy_version = "unknown"
+    return f"dacy-{dacy_version}-{size}"
+
+
+def is_loaded(size: str = "large") -> bool:
+    """
+    Checks whether a DaCy model is already loaded in this process
+
+    Args:
+        size: Size of the DaCy model
+
+    Returns:
+        Whether the model is cached
+
+    """
+    return size in _models
+
+
+def load_time(size: str = "large") -> Optional[float]:
+    """
+    Returns the time spent loading a DaCy model
+
+    Args:
+        size: Size of the DaCy model
+
+    Returns:
+        Load time in seconds, or None if the model has not been loaded
+
+    """
+    return _load_times.get(size)
+
+
+def unload_model(size: str = "large") -> None:
+    """
+    Removes a DaCy model from the cache to release its memory
+
+    Args:
+        size: Size of the DaCy model
+
+    Returns:
+        None
+
+    """
+    with _lock:
+        _models.pop(size, None)
+        _load_times.pop(size, None)
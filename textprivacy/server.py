@@ -0,0 +1,274 @@
+"""Local HTTP service masking texts in micro-batches."""
+
+from typing import List, Dict, Any, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import queue
+import threading
+import time
+
+from textprivacy.textanonymization import TextAnonymizer
+
+
+class _Request(object):
+    """
+    A text waiting to be masked by the batching thread
+
+    Args:
+        text: The text to mask
+
+    """
+
+    __slots__ = ("text", "masked", "error", "batch_size", "done")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.masked: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.batch_size = 0
+        self.done = threading.Event()
+
+
+class MaskingService(object):
+    """
+    Coalesces texts from concurrent requests into micro-batches, so DaCy runs on many
+    texts at once while the model stays loaded. A batch is started as soon as it is full
+    or when the first text of it has waited for max_latency seconds. Each micro-batch is
+    masked without individuals, so pseudonyms never carry over between requests
+
+    Args:
+        mask_transformer: The TextAnonymizer or TextPseudonymizer to mask with
+        masking_order: The order of applying masking functions
+        batch_size: Used for DaCy running in batch mode
+        n_process: Number of CPU cores to split computational on
+        max_batch_size: Maximum number of texts in a micro-batch
+        max_latency: Seconds to wait for more texts before masking a micro-batch
+
+    """
+
+    def __init__(
+        self,
+        mask_transformer: TextAnonymizer,
+        masking_order: List[str] = ["CPR", "TELEFON", "EMAIL", "NER"],
+        batch_size: int = 8,
+        n_process: int = 1,
+        max_batch_size: int = 32,
+        max_latency: float = 0.01,
+    ):
+        super(MaskingService, self).__init__()
+        self.mask_transformer = mask_transformer
+        self.masking_order = masking_order
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_latency = max_latency
+        self.requests_processed = 0
+        self.batches_processed = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        """
+        Waits for a text and collects more texts until the batch is full or the latency window has passed
+
+        Returns:
+            A list of requests, or None when the service is closed
+
+        """
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                # finish the current batch before stopping
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            # texts are indexed by their place in the batch, so every batch starts
+            # without individuals and requests never share pseudonyms
+            individuals = self.mask_transformer.individuals
+            self.mask_transformer.individuals = {}
+            try:
+                masked = list(
+                    self.mask_transformer.mask_stream(
+                        [request.text for request in batch],
+                        masking_order=self.masking_order,
+                        batch_size=self.batch_size,
+                        n_process=self.n_process,
+                        chunk_size=len(batch),
+                        loglevel="WARNING",
+                    )
+                )
+            except Exception as error:
+                logging.exception(f"Masking a batch of {len(batch)} texts failed")
+                for request in batch:
+                    request.error = error
+                    request.done.set()
+                continue
+            finally:
+                self.mask_transformer.individuals = individuals
+
+            self.requests_processed += len(batch)
+            self.batches_processed += 1
+            for request, text in zip(batch, masked):
+                request.masked = text
+                request.batch_size = len(batch)
+                request.done.set()
+
+    def mask(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        Masks texts together with the texts of concurrent requests
+
+        Args:
+            texts: Texts to mask
+
+        Returns:
+            A dictionary of the masked texts, the latency in milliseconds, the queue depth
+            when the texts were submitted and the sizes of the micro-batches used
+
+        """
+        start = time.perf_counter()
+        queue_depth = self._queue.qsize()
+        requests = [_Request(text) for text in texts]
+        for request in requests:
+            self._queue.put(request)
+        for request in requests:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+
+        return {
+            "masked": [request.masked for request in requests],
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+            "queue_depth": queue_depth,
+            "batch_sizes": [request.batch_size for request in requests],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Reports the load of the service
+
+        Returns:
+            A dictionary of the queue depth, and the numbers of texts and batches processed
+
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "requests_processed": self.requests_processed,
+            "batches_processed": self.batches_processed,
+        }
+
+    def close(self) -> None:
+        """
+        Masks the texts already queued and stops the batching thread
+
+        Returns:
+            None
+
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+
+class MaskingRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves POST /mask with a JSON body of {"text": ...} or {"texts": [...]},
+    and GET /health
+    """
+
+    service: MaskingService = None  # type: ignore
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, dict(status="ok", **self.service.stats()))
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/mask":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+            single = "texts" not in body
+            texts = [body["text"]] if single else body["texts"]
+            if not all(isinstance(text, str) for text in texts):
+                raise ValueError("texts must be strings")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._send_json(
+                400, {"error": 'expected a JSON body with "text" or "texts"'}
+            )
+            return
+
+        try:
+            result = self.service.mask(texts)
+        except Exception as error:
+            self._send_json(500, {"error": str(error)})
+            return
+
+        if single:
+            result["masked"] = result["masked"][0]
+            result["batch_size"] = result.pop("batch_sizes")[0]
+        self._send_json(200, result)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(
+    service: MaskingService, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    """
+    Creates an HTTP server handing requests to a masking service
+
+    Args:
+        service: The masking service
+        host: Host to listen on
+        port: Port to listen on (0 picks a free port)
+
+    Returns:
+        The HTTP server, which is started with serve_forever
+
+    """
+    handler = type(
+        "BoundMaskingRequestHandler", (MaskingRequestHandler,), {"service": service}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,239 @@
+"""Deterministic sharding of masking jobs across machines."""
+
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from collections import deque
+import hashlib
+import heapq
+import json
+import os
+import re
+
+from textprivacy.textanonymization import TextAnonymizer
+from textprivacy.utils import write_json_atomic
+
+_PART_NAME = re.compile(r"^part-(\d+)-of-(\d+)\.manifest\.json$")
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parses a shard given as i/N, where shards are numbered from 0 to N-1
+
+    Args:
+        value: The shard, e.g. 0/4
+
+    Returns:
+        A tuple of the shard and the number of shards
+
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", value)
+    if match is None:
+        raise ValueError(f"Shard must be given as i/N, got '{value}'")
+    shard, n_shards = int(match.group(1)), int(match.group(2))
+    if not 0 <= shard < n_shards:
+        raise ValueError(f"Shard {shard} must be between 0 and {n_shards - 1}")
+    return shard, n_shards
+
+
+def shard_of(index: int, n_shards: int, key: Any = None) -> int:
+    """
+    Assigns a document to a shard, by its index or by a stable hash of its key, which
+    does not depend on the machine or Python process
+
+    Args:
+        index: Position of the document in the input
+        n_shards: Number of shards
+        key: Key of the document to hash instead of using its index
+
+    Returns:
+        The shard of the document
+
+    """
+    if key is None:
+        return index % n_shards
+    digest = hashlib.sha256(str(key).encode("utf-8", "surrogatepass")).digest()
+    return int.from_bytes(digest[:8], "big") % n_shards
+
+
+def part_name(shard: int, n_shards: int) -> str:
+    """
+    Name of the output part of a shard
+
+    Args:
+        shard: The shard
+        n_shards: Number of shards
+
+    Returns:
+        The file name of the part without extension
+
+    """
+    return f"part-{shard:05d}-of-{n_shards:05d}"
+
+
+def mask_shard(
+    mask_transformer: TextAnonymizer,
+    records: Iterable[Union[str, Tuple[Any, Optional[str]]]],
+    directory: str,
+    shard: int,
+    n_shards: int,
+    key: Callable[[Any], Any] = None,
+    substitute: Callable[[Any, str], Any] = None,
+    fmt: str = "text",
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Masks the documents of one shard and writes them as a part of JSON lines with the
+    index of each document, followed by a manifest describing the part. Every shard
+    reads the whole input, so the indices are the same on every machine
+
+    Args:
+        mask_transformer: The TextAnonymizer or TextPseudonymizer to mask with
+        records: Iterable of texts, or of (record, text) pairs
+        directory: Directory to write the part and its manifest to
+        shard: The shard to mask, from 0 to n_shards - 1
+        n_shards: Number of shards
+        key: Function giving the key of a record to shard by (default is by index)
+        substitute: Function putting the masked text into a record (default is the masked text)
+        fmt: Format of the records, recorded in the manifest for merging
+        kwargs: Keyword arguments passed on to mask_stream
+
+    Returns:
+        The manifest of the part
+
+    """
+    if not 0 <= shard < n_shards:
+        raise ValueError(f"Shard {shard} must be between 0 and {n_shards - 1}")
+    os.makedirs(directory, exist_ok=True)
+    name = part_name(shard, n_shards)
+    part_path = os.path.join(directory, name + ".jsonl")
+    pending: Deque[Tuple[int, Any]] = deque()
+    total = 0
+
+    def texts() -> Iterator[Tuple[int, str]]:
+        nonlocal total
+        for index, item in enumerate(records):
+            total += 1
+            record, text = (item, item) if isinstance(item, str) else item
+            if shard_of(index, n_shards, key(record) if key else None) == shard:
+                pending.append((index, record))
+                yield index, text if isinstance(text, str) else ""
+
+    digest = hashlib.sha256()
+    count = 0
+    tmp_path = part_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for masked in mask_transformer.mask_stream(texts(), **kwargs):
+            index, record = pending.popleft()
+            if substitute is not None:
+                record = substitute(record, masked)
+            elif isinstance(record, str):
+                record = masked
+            line = json.dumps({"index": index, "record": record}, ensure_ascii=False)
+            line += "\n"
+            f.write(line)
+            digest.update(line.encode("utf-8"))
+            count += 1
+    os.replace(tmp_path, part_path)
+
+    manifest = {
+        "part": name + ".jsonl",
+        "shard": shard,
+        "n_shards": n_shards,
+        "sharding": "index" if key is None else "key",
+        "format": fmt,
+        "total": total,
+        "count": count,
+        "sha256": digest.hexdigest(),
+    }
+    # the manifest is written last and marks the part as complete
+    write_json_atomic(os.path.join(directory, name + ".manifest.json"), manifest)
+    return manifest
+
+
+def read_manifests(directory: str) -> List[Dict[str, Any]]:
+    """
+    Reads and verifies the manifests and parts of all shards of a job
+
+    Args:
+        directory: Directory of the parts
+
+    Returns:
+        The manifests ordered by shard
+
+    """
+    manifests = []
+    for file_name in sorted(os.listdir(directory)):
+        if _PART_NAME.match(file_name):
+            with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+                manifests.append(json.load(f))
+    if not manifests:
+        raise ValueError(f"No shard manifests found in {directory}")
+
+    n_shards = manifests[0]["n_shards"]
+    for field in ["n_shards", "total", "format", "sharding"]:
+        values = {str(x[field]) for x in manifests}
+        if len(values) > 1:
+            raise ValueError(f"Shards disagree on {field}: {', '.join(sorted(values))}")
+
+    shards = [x["shard"] for x in manifests]
+    missing = sorted(set(range(n_shards)) - set(shards))
+    if missing:
+        raise ValueError(f"Missing shards {missing} of {n_shards}")
+    if len(shards) != n_shards:
+        raise ValueError(f"Expected {n_shards} shards, found {len(shards)}")
+
+    for manifest in manifests:
+        digest = hashlib.sha256()
+        with open(os.path.join(directory, manifest["part"]), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != manifest["sha256"]:
+            raise ValueError(f"Checksum of {manifest['part']} does not match")
+
+    total = manifests[0]["total"]
+    count = sum(x["count"] for x in manifests)
+    if count != total:
+        raise ValueError(f"Shards hold {count} documents, the input had {total}")
+    return sorted(manifests, key=lambda x: x["shard"])
+
+
+def _read_part(path: str) -> Iterator[Tuple[int, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            item = json.loads(line)
+            yield item["index"], item["record"]
+
+
+def merge_shards(directory: str) -> Iterator[Any]:
+    """
+    Reassembles the masked documents of all shards in their original order, verifying
+    that every part is complete and unchanged and no document is missing or duplicated
+
+    Args:
+        directory: Directory of the parts
+
+    Returns:
+        An iterator of the masked records in the order of the input
+
+    """
+    manifests = read_manifests(directory)
+    parts = [_read_part(os.path.join(directory, x["part"])) for x in manifests]
+
+    expected = 0
+    for index, record in heapq.merge(*parts, key=lambda x: x[0]):
+        if index < expected:
+            raise ValueError(f"Document {index} is duplicated")
+        if index > expected:
+            raise ValueError(f"Document {expected} is missing")
+        yield record
+        expected += 1
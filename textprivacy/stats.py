@@ -0,0 +1,211 @@
+"""Instrumentation of masking runs."""
+
+from typing import Any, Dict, List, Tuple
+from collections import Counter
+import heapq
+import time
+
+
+class _StageTimer(object):
+    """
+    Adds the wall time of a block to a stage of a MaskingStats
+
+    Args:
+        stats: The stats to add the time to
+        stage: Name of the stage
+
+    """
+
+    __slots__ = ("stats", "stage", "start")
+
+    def __init__(self, stats: "MaskingStats", stage: str):
+        self.stats = stats
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stats.add_time(self.stage, time.perf_counter() - self.start)
+
+
+class _NoTimer(object):
+    """
+    Does nothing, used when a run is not instrumented
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+NO_TIMER = _NoTimer()
+
+
+class MaskingStats(object):
+    """
+    Collects the wall time of each stage of a masking run, the throughput, the number of
+    entities found of each type, the bytes processed and the slowest documents. Pass it
+    to mask_corpus or mask_stream, and subclass it and override on_document or
+    add_time to observe the run as it progresses. Stages are "ner", "detectors" (the
+    regex detectors), "detect:<method>" for custom functions,
+    "linking", "masking" and "noise"
+
+    Args:
+        n_slowest: Number of slowest documents to keep
+
+    """
+
+    def __init__(self, n_slowest: int = 10):
+        super(MaskingStats, self).__init__()
+        self.n_slowest = n_slowest
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.entities: Counter = Counter()
+        self.documents = 0
+        self.bytes = 0
+        self.started: float = None  # type: ignore
+        self.stopped: float = None  # type: ignore
+        self._slowest: List[Tuple[float, int]] = []
+
+    def time(self, stage: str) -> _StageTimer:
+        """
+        Times a block as part of a stage
+
+        Args:
+            stage: Name of the stage
+
+        Returns:
+            A context manager timing the block
+
+        """
+        return _StageTimer(self, stage)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """
+        Adds wall time to a stage
+
+        Args:
+            stage: Name of the stage
+            seconds: Seconds spent
+
+        Returns:
+            None
+
+        """
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    def add_entities(self, entity_type: str, count: int) -> None:
+        """
+        Counts entities found in a document
+
+        Args:
+            entity_type: Type of the entities
+            count: Number of distinct entities found
+
+        Returns:
+            None
+
+        """
+        if count:
+            self.entities[entity_type] += count
+
+    def on_document(self, index: int, text: str, seconds: float = None) -> None:
+        """
+        Records a masked document
+
+        Args:
+            index: Index of the document
+            text: The document before masking
+            seconds: Seconds spent masking the document after NER, if measured
+
+        Returns:
+            None
+
+        """
+        self.documents += 1
+        self.bytes += len(text.encode("utf-8", "surrogatepass"))
+        if seconds is None:
+            return
+        if len(self._slowest) < self.n_slowest:
+            heapq.heappush(self._slowest, (seconds, index))
+        elif self._slowest and seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, index))
+
+    def start(self) -> None:
+        """
+        Marks the start of the run, unless it has already started
+
+        Returns:
+            None
+
+        """
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        """
+        Marks the end of the run so far
+
+        Returns:
+            None
+
+        """
+        self.stopped = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.stopped or time.perf_counter()) - self.started
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.documents / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def slowest(self) -> List[Tuple[int, float]]:
+        """
+        The slowest documents to mask after NER
+
+        Returns:
+            A list of (index, seconds) pairs, slowest first
+
+        """
+        ranked = sorted(self._slowest, reverse=True)
+        return [(index, seconds) for seconds, index in ranked]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Summarizes the run
+
+        Returns:
+            A JSON serializable dictionary of the statistics
+
+        """
+        return {
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 6),
+            "docs_per_sec": round(self.docs_per_sec, 2),
+            "stages": {
+                stage: {
+                    "seconds": round(seconds, 6),
+                    "calls": self.stage_calls[stage],
+                }
+                for stage, seconds in sorted(
+                    self.stage_seconds.items(), key=lambda x: x[1], reverse=True
+                )
+            },
+            "entities": dict(self.entities),
+            "slowest": [
+                {"index": index, "seconds": round(seconds, 6)}
+                for index, seconds in self.slowest
+            ],
+        }
@@ -1,22 +1,56 @@
 """Main module."""
 
-from typing import List, Dict, Union, Set, Callable
+from typing import (
+    List,
+    Dict,
+    Union,
+    Set,
+    Callable,
+    Tuple,
+    Iterable,
+    Iterator,
+    Pattern,
+    AsyncIterable,
+    AsyncIterator,
+    Optional,
+    Any,
+)
+from itertools import islice
+import asyncio
+import concurrent.futures
 import os
+import time
 from sys import platform
 import logging
-import dacy
 
 import re
-import spacy
-import torch
-import torch.nn as nn
 import multiprocessing
+import multiprocessing.pool
 import numpy as np
 
-from textprivacy.utils import is_valid_number, get_integer, get_float, laplace_noise
-
-spacy.prefer_gpu()
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+from textprivacy.detectors import (
+    CPR_PATTERN,
+    TELEFON_PATTERN,
+    EMAIL_PATTERN,
+    DETECTORS,
+    find_matches,
+    scan,
+)
+from textprivacy.executor import NERExecutor, batch_indices, compact_doc, worker
+from textprivacy.cache import NERCache
+from textprivacy.checkpoint import CorpusCheckpoint
+from textprivacy.stats import MaskingStats, NO_TIMER
+from textprivacy.models import get_model, get_device, model_id
+from textprivacy.utils import (
+    parse_number,
+    laplace_noise_batch,
+    find_entity_spans,
+    replace_spans,
+    resolve_overlaps,
+    split_text,
+    merge_chunk_spans,
+    EntitySpan,
+)
 
 try:
     if platform == "linux" or platform == "linux2" or platform == "darwin":
@@ -29,16 +63,51 @@ except RuntimeError:
 
 ######### DaCy multiprocessing hack START #########
 # Hack to make DaCy multiprocessable for both spawn and fork (SpaCy 3.0 issue with pickle)
-torch.set_num_threads(1)
+# The model is loaded lazily through textprivacy.models and inherited by forked workers
 num_cpus: int = int(os.cpu_count())  # type: ignore
-ner_model = dacy.load("large")
 
+######### DaCy multiprocessing hack END #########
 
-def worker(text: List[str]):  # type: ignore
-    return list(ner_model.pipe(text, batch_size=len(text)))
+# Masking object and settings inherited by forked masking workers
+_masking_context: Dict[str, object] = {}
+
+
+def masking_worker(
+    items: List[Tuple[int, str, Union[Dict[str, Set[str]], List[EntitySpan]]]],
+) -> List[Tuple[int, str, object]]:
+    anonymizer = _masking_context["anonymizer"]
+    methods = _masking_context["methods"]
+    masking_order = _masking_context["masking_order"]
+    results = []
+    for index, text, ner_entities in items:
+        preset = anonymizer._masking_state(index) is not None  # type: ignore
+        text = anonymizer._mask_text(  # type: ignore
+            text, methods, masking_order, ner_entities, index
+        )
+        results.append((index, text, anonymizer._masking_state(index)))  # type: ignore
+        # the state is kept by the parent, so the worker does not grow it over a stream
+        if not preset:
+            anonymizer._forget_masking_state(index)  # type: ignore
+    return results
 
 
-######### DaCy multiprocessing hack END #########
+async def _aiterate(items: Union[Iterable, AsyncIterable]) -> AsyncIterator[Any]:
+    """
+    Iterates over a synchronous or asynchronous iterable
+
+    Args:
+        items: The iterable
+
+    Returns:
+        An async iterator of the items
+
+    """
+    if hasattr(items, "__aiter__"):
+        async for item in items:  # type: ignore
+            yield item
+    else:
+        for item in items:  # type: ignore
+            yield item
 
 
 class TextAnonymizer(object):
@@ -51,6 +120,10 @@ class TextAnonymizer(object):
         suppression: Whether to suppress all entities with XXX
         individuals: Preset known individuals as a dict of dicts of dicts for specifying text index, person index and entities. For example:
                     individuals = { 100: {'PER': {'Martin Jespersen', 'Martin', 'Jespersen, Martin'} } }
+        model_size: Size of the DaCy model used for NER ("small", "medium" or "large"), loaded on first use
+        executor: A running NERExecutor to reuse across calls instead of starting new workers on every call
+        ner_cache: A NERCache to reuse the entities of texts which have been predicted before
+        seed: Seed of the random generator used for noising numbers, for reproducible results
 
     """
 
@@ -59,18 +132,29 @@ class TextAnonymizer(object):
         corpus: List[str] = [],
         mask_misc: bool = False,
         suppression: bool = False,
-        individuals: Dict[int, Dict[str, Set[str]]] = {},
+        individuals: Dict[int, Dict[str, Set[str]]] = None,
         mask_numbers: bool = False,
         epsilon: float = None,
+        model_size: str = "large",
+        executor: NERExecutor = None,
+        ner_cache: NERCache = None,
+        seed: int = None,
     ):
         super(TextAnonymizer, self).__init__()
         self.corpus = corpus
+        self.model_size = model_size
+        self.executor = executor
+        self.ner_cache = ner_cache
+        self.seed = seed
+        self._seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self._seed_sequence)
         self.mask_misc = mask_misc
         self.mask_numbers = mask_numbers
         self.epsilon = epsilon
         self.suppression = suppression
-        self.individuals = individuals
+        self.individuals = individuals if individuals is not None else {}
         self.transformed_corpus: List[str]
+        self._stats: Optional[MaskingStats] = None
         self.mapping: Dict[str, str] = {
             "PER": "[PERSON]",
             "LOC": "[LOKATION]",
@@ -92,6 +176,42 @@ class TextAnonymizer(object):
         if self.suppression:
             self.mapping = {key: "XXX" for key in self.mapping}
 
+    def _timed(self, stage: str) -> Any:
+        """
+        Times a block as part of a stage when the run is instrumented
+
+        Args:
+            stage: Name of the stage
+
+        Returns:
+            A context manager timing the block, which does nothing without stats
+
+        """
+        return NO_TIMER if self._stats is None else self._stats.time(stage)
+
+    def _text_rng(self, index: int) -> np.random.Generator:
+        """
+        Random generator of a single text, independent of the order and process the texts are masked in
+
+        Args:
+            index: Index of the text's placement in corpus
+
+        Returns:
+            A random generator derived from the seed and the index
+
+        """
+        seed = np.random.SeedSequence(
+            self._seed_sequence.entropy, spawn_key=(abs(index),)
+        )
+        return np.random.default_rng(seed)
+
+    @property
+    def ner_model(self):
+        """
+        The DaCy model of the chosen size, loaded and cached on first access
+        """
+        return get_model(self.model_size)
+
     def find_cpr(self, text: str) -> Set[str]:
         """
         Find CPR numbers from a text
@@ -103,10 +223,7 @@ class TextAnonymizer(object):
             A set of CPR entities
 
         """
-        cpr_pattern = "|".join(
-            [r"[0-3]\d{1}[0-1]\d{3}-\d{4}", r"[0-3]\d{1}[0-1]\d{3} \d{4}"]
-        )
-        cprs = set(re.findall(cpr_pattern, text))
+        cprs = set(CPR_PATTERN.findall(text))
         return cprs
 
     def find_telefon_nr(self, text: str) -> Set[str]:
@@ -120,22 +237,7 @@ class TextAnonymizer(object):
             A set of telephone number entities
 
         """
-        tlf_pattern = "|".join(
-            [
-                r"\+\d{10}",
-                r"\+\d{4} \d{2} \d{2} \d{2}",
-                r"\+\d{2} \d{8}",
-                r"\+\d{2} \d{2} \d{2} \d{2} \d{2}",
-                r"\+\d{2} \d{4} \d{4}",
-                r"\d{2} \d{4} \d{4}",
-                r"\d{2} \d{4}\-\d{4}",
-                r"\d{8}",
-                r"\d{4} \d{4}",
-                r"\d{4}\-\d{4}",
-                r"\d{2} \d{2} \d{2} \d{2}",
-            ]
-        )
-        tlf_nrs = set(re.findall(tlf_pattern, text))
+        tlf_nrs = set(TELEFON_PATTERN.findall(text))
         return tlf_nrs
 
     def find_email(self, text: str) -> Set[str]:
@@ -149,8 +251,7 @@ class TextAnonymizer(object):
             A set of email entities
 
         """
-        mail_pattern = r"[\w\.-]+@[\w\.-]+(?:\.[\w]+)+"
-        emails = set(re.findall(mail_pattern, text))
+        emails = set(EMAIL_PATTERN.findall(text))
         return emails
 
     def mask_entities(
@@ -169,62 +270,86 @@ class TextAnonymizer(object):
             A text with the entity masked
 
         """
-        sorted_entities = sorted(list(set(entities)), key=len, reverse=True)
-        for ent in sorted_entities:
-            ent = ent.strip()
-            if ent_type == "PER":
-                ent = ent.replace(".", "")
-            if ent != "" and not (
-                ent_type in ["PER", "LOC", "ORG", "EMAIL", "CPR", "TELEFON"]
-                and len(ent) <= 2
-            ):
-                ent_regex = r"(.?)({})(.?)".format(re.escape(ent))
-                regexs = re.findall(ent_regex, text)
-
-                # ensure entities are not subwords or subnumbers
-                for reg_prefix, word, reg_suffix in regexs:
-
-                    if not re.search(
-                        r"[a-zæøåA-ZÆØÅ0-9]", reg_prefix
-                    ) and not re.search(r"[a-zæøåA-ZÆØÅ0-9]", reg_suffix):
-                        to_be_masked = re.escape(
-                            r"{}{}{}".format(reg_prefix, word, reg_suffix)
-                        )
-                        to_mask = r"{}{}{}{}".format(
-                            reg_prefix, self.mapping[ent_type], suffix, reg_suffix
-                        )
+        return self._mask_all(text, [(ent_type, ent, suffix) for ent in entities])
 
-                        text = re.sub(to_be_masked, to_mask, text)
+    def _mask_all(self, text: str, entities: Iterable[Tuple[str, str, str]]) -> str:
+        """
+        Masks entities of any type in a single pass over the text, giving priority to longer entities
 
-        return text
+        Args:
+            text: Text to remove entities from
+            entities: Tuples of entity type, entity and suffix to the placeholder
+
+        Returns:
+            A text with the entities masked
+
+        """
+        replacements: Dict[str, str] = {}
+        for ent_type, ent, suffix in sorted(
+            dict.fromkeys(entities), key=lambda x: len(x[1]), reverse=True
+        ):
+            ent = self._normalize_entity(ent_type, ent)
+            if ent:
+                replacements.setdefault(ent, self.mapping[ent_type] + suffix)
+
+        return replace_spans(text, find_entity_spans(text, replacements))
+
+    @staticmethod
+    def _normalize_entity(ent_type: str, ent: str) -> str:
+        """
+        Strips an entity and removes dots from persons, dropping entities too short to mask
+
+        Args:
+            ent_type: Type of the entity
+            ent: The entity
+
+        Returns:
+            The entity to search for, or an empty string if it should not be masked
+
+        """
+        ent = ent.strip()
+        if ent_type == "PER":
+            ent = ent.replace(".", "")
+        if (
+            ent_type in ["PER", "LOC", "ORG", "EMAIL", "CPR", "TELEFON"]
+            and len(ent) <= 2
+        ):
+            return ""
+        return ent
 
     def noisy_numbers(
         self,
         text: str,
-        entities: Set[str],
+        entities: Union[Set[str], Dict[str, str]],
         epsilon: float,
         placeholder: str = "[NUMMER]",
         suffix: str = "",
+        rng: np.random.Generator = None,
     ) -> str:
         """
-        Adds noises to numbers
+        Adds noises to numbers in a single pass over the tokens of the text, drawing the noise of all numbers at once
 
         Args:
             text: Text to mask numbers from
-            entities: Set of numbers to add noise or remove
+            entities: Set of numbers to add noise or remove, or a dictionary of numbers and the suffix of their placeholder
             epsilon: Parameter used for laplace distribution (similar to differential privacy)
             placeholder: Fallback placeholder for invalid numbers
-            suffix: Fallback suffix for pseudonymized numbers
+            suffix: Fallback suffix for pseudonymized numbers given as a set
+            rng: Random generator to draw the noise from (default is the generator of the object)
 
         Returns:
             A text with the entity masked
 
         """
-
-        tokens = ner_model.tokenizer(text)
+        suffixes = entities if isinstance(entities, dict) else {}
+        tokens = self.ner_model.tokenizer(text)
 
         words = list()
         prev_word = ""
+        values: List[Union[float, int]] = []
+        signs: List[str] = []
+        kinds: List[str] = []
+        positions: List[Tuple[int, int, str]] = []
         for token in tokens:
             # avoid applying noise to pseudo identifiers
             if token.text not in entities or prev_word in self.mapping.values():
@@ -232,24 +357,28 @@ class TextAnonymizer(object):
                 words.append("{}{}".format(token.text, token.whitespace_))
                 continue
 
-            validity = is_valid_number(token.text)
-            precision = None
-            sign = ""
+            validity, value, precision, sign = parse_number(token.text)
             if validity == "invalid":
-                word = "{}{}{}".format(placeholder, suffix, token.whitespace_)
+                word = "{}{}{}".format(
+                    placeholder, suffixes.get(token.text, suffix), token.whitespace_
+                )
                 prev_word = word
                 words.append(word)
-            elif validity == "float":
-                value, precision, sign = get_float(token.text)
-            else:
-                value = get_integer(token.text)
-            noisy_number = laplace_noise(value, epsilon, sign, validity)
-            string_number = str(round(noisy_number, precision))
-            word = "{}{}".format(string_number, token.whitespace_)
-            prev_word = word
-            words.append(word)
+                continue
+
+            # noise is drawn for all numbers at once below
+            values.append(value)  # type: ignore
+            signs.append(sign)
+            kinds.append(validity)
+            positions.append((len(words), precision, token.whitespace_))
+            prev_word = token.text
+            words.append(token.text)
 
-            prev_word = word
+        noisy_values = laplace_noise_batch(
+            values, epsilon, signs, kinds, rng if rng is not None else self.rng
+        )
+        for (i, precision, whitespace), noisy_number in zip(positions, noisy_values):
+            words[i] = "{}{}".format(str(round(noisy_number, precision)), whitespace)
 
         return "".join(words)
 
@@ -257,10 +386,34 @@ class TextAnonymizer(object):
     ################## Helper functions #################
     """
 
+    def _detect_entities(
+        self,
+        text: str,
+        methods: Dict[str, Union[Callable, Pattern]],
+        masking_order: List[str],
+    ) -> Dict[str, Set[str]]:
+        """
+        Runs each precompiled regex detector of the masking order over a text
+
+        Args:
+            text: Text to find entities in
+            methods: A dictionary of masking methods, where compiled patterns are regex detectors
+            masking_order: The order of applying masking functions
+
+        Returns:
+            A dictionary of the entities found by each regex detector
+
+        """
+        return {
+            method: find_matches(text, methods[method])  # type: ignore
+            for method in masking_order
+            if isinstance(methods.get(method), re.Pattern)
+        }
+
     def _apply_masks(
         self,
         text: str,
-        methods: Dict[str, Callable],
+        methods: Dict[str, Union[Callable, Pattern]],
         masking_order: List[str],
         ner_entities: Dict[str, Set[str]],
         index: int,
@@ -270,7 +423,7 @@ class TextAnonymizer(object):
 
         Args:
             text: Text to mask entities from
-            methods: A dictionary of masking methods to apply
+            methods: A dictionary of masking methods to apply, either functions or compiled regex detectors
             masking_order: The order of applying masking functions
             ner_entities: A dictiornary of lists containing the named entities found with DaCy
             index: Index of the text's placement in corpus
@@ -283,28 +436,46 @@ class TextAnonymizer(object):
         current_individuals = self.individuals.get(index, {})
         for method in masking_order:
             if method != "NER" and method in self.mapping:
-                method_entitites = methods[method](text)
+                # each method finds its entities in the text masked so far
+                if isinstance(methods[method], re.Pattern):
+                    with self._timed("detectors"):
+                        method_entitites = find_matches(
+                            text, methods[method]  # type: ignore
+                        )
+                else:
+                    with self._timed("detect:" + method):
+                        method_entitites = methods[method](text)  # type: ignore
+                if self._stats is not None:
+                    self._stats.add_entities(method, len(method_entitites))
                 method_entitites = method_entitites.union(
                     current_individuals.get(method, set([]))
                 )
-                text = self.mask_entities(text, method_entitites, method)
+                with self._timed("masking"):
+                    text = self.mask_entities(text, method_entitites, method)
             else:
                 # Handle DaCy entities
                 for ent_name in ner_entities:
                     if ent_name in self.mapping:
+                        if self._stats is not None:
+                            self._stats.add_entities(
+                                ent_name, len(ner_entities[ent_name])
+                            )
                         rm_ents = ner_entities[ent_name].union(
                             current_individuals.get(ent_name, set())
                         )
 
                         if ent_name == "NUM" and self.epsilon:
-                            text = self.noisy_numbers(
-                                text,
-                                rm_ents,
-                                self.epsilon,
-                                placeholder=self.mapping[ent_name],
-                            )
+                            with self._timed("noise"):
+                                text = self.noisy_numbers(
+                                    text,
+                                    rm_ents,
+                                    self.epsilon,
+                                    placeholder=self.mapping[ent_name],
+                                    rng=self._text_rng(index),
+                                )
                         else:
-                            text = self.mask_entities(text, rm_ents, ent_name)
+                            with self._timed("masking"):
+                                text = self.mask_entities(text, rm_ents, ent_name)
 
                         if ent_name == "PER" and len(rm_ents) == 0:
                             logging.warning(
@@ -313,83 +484,653 @@ class TextAnonymizer(object):
 
         return text
 
-    def _batch_prediction_DaCy(
-        self, batch_size: int, n_process: int
-    ) -> List[Dict[str, Set[str]]]:
+    def _trim_span(
+        self, text: str, ent_type: str, start: int, end: int
+    ) -> Optional[Tuple[int, int]]:
         """
-        Runs DaCy NER model on full corpus in batch mode and masks entities
+        Trims whitespace around an entity found at known offsets, dropping entities too short to mask
+
+        Args:
+            text: Text the entity was found in
+            ent_type: Type of the entity
+            start: Index of the first character of the entity
+            end: Index after the last character of the entity
+
+        Returns:
+            The trimmed offsets, or None if the entity should not be masked
+
+        """
+        entity = text[start:end]
+        if not self._normalize_entity(ent_type, entity):
+            return None
+        start += len(entity) - len(entity.lstrip())
+        return start, start + len(entity.strip())
+
+    def _splice_masks(
+        self,
+        text: str,
+        spans: List[Tuple[int, int, int, str, bool]],
+        aliases: List[Tuple[int, str, str, str, bool]],
+        index: int,
+    ) -> str:
+        """
+        Masks entities found at known offsets together with entities found by string search,
+        resolving overlaps by priority and length, in a single splice of the text
+
+        Args:
+            text: Text to mask entities from
+            spans: Entities with offsets as (priority, start, end, placeholder, noise)
+            aliases: Entities to search for as (priority, entity type, entity, placeholder, noise)
+            index: Index of the text's placement in corpus
+
+        Returns:
+            A text with the entities masked, and numbers flagged for noise replaced by noisy numbers
+
+        """
+        candidates = list(spans)
+        groups: Dict[Tuple[int, bool], Dict[str, str]] = {}
+        for priority, ent_type, ent, placeholder, noise in sorted(
+            aliases, key=lambda x: len(x[2]), reverse=True
+        ):
+            ent = self._normalize_entity(ent_type, ent)
+            if ent:
+                groups.setdefault((priority, noise), {}).setdefault(ent, placeholder)
+        for (priority, noise), replacements in groups.items():
+            candidates.extend(
+                (priority, start, end, placeholder, noise)
+                for start, end, placeholder in find_entity_spans(text, replacements)
+            )
+
+        kept = resolve_overlaps(candidates)
+        masks = [(start, end, placeholder) for _, start, end, placeholder, _ in kept]
+
+        numbers = [
+            (i, parse_number(text[start:end]))
+            for i, (_, start, end, _, noise) in enumerate(kept)
+            if noise
+        ]
+        numbers = [(i, parsed) for i, parsed in numbers if parsed[0] != "invalid"]
+        if numbers and self.epsilon:
+            noisy_values = laplace_noise_batch(
+                [parsed[1] for _, parsed in numbers],  # type: ignore
+                self.epsilon,
+                [parsed[3] for _, parsed in numbers],
+                [parsed[0] for _, parsed in numbers],
+                self._text_rng(index),
+            )
+            for (i, parsed), noisy_number in zip(numbers, noisy_values):
+                start, end, _ = masks[i]
+                masks[i] = (start, end, str(round(noisy_number, parsed[2])))
+
+        return replace_spans(text, masks)
+
+    def _apply_offset_masks(
+        self,
+        text: str,
+        methods: Dict[str, Union[Callable, Pattern]],
+        masking_order: List[str],
+        ner_spans: List[EntitySpan],
+        index: int,
+    ) -> str:
+        """
+        Masks the entities of a text at the offsets where DaCy and the regex detectors found them.
+        Only entities without offsets (from custom functions and individuals) are searched for
+
+        Args:
+            text: Text to mask entities from
+            methods: A dictionary of masking methods to apply, either functions or compiled regex detectors
+            masking_order: The order of applying masking functions, which is also their priority
+            ner_spans: The entity spans found with DaCy
+            index: Index of the text's placement in corpus
+
+        Returns:
+            A text with the entities masked
+
+        """
+        current_individuals = self.individuals.get(index, {})
+        priorities: Dict[str, int] = {}
+        for i, method in enumerate(masking_order):
+            priorities.setdefault(method, i)
+
+        spans: List[Tuple[int, int, int, str, bool]] = []
+        aliases: List[Tuple[int, str, str, str, bool]] = []
+
+        def add_span(ent_type: str, start: int, end: int, priority: int) -> None:
+            trimmed = self._trim_span(text, ent_type, start, end)
+            if trimmed is not None:
+                noise = ent_type == "NUM" and bool(self.epsilon)
+                spans.append((priority, *trimmed, self.mapping[ent_type], noise))
+
+        def add_aliases(ent_type: str, entities: Set[str], priority: int) -> None:
+            noise = ent_type == "NUM" and bool(self.epsilon)
+            for ent in entities:
+                aliases.append((priority, ent_type, ent, self.mapping[ent_type], noise))
+
+        detectors = [
+            (method, methods[method])
+            for method in masking_order
+            if method in self.mapping and isinstance(methods.get(method), re.Pattern)
+        ]
+        with self._timed("detectors"):
+            matches = scan(text, detectors)  # type: ignore
+        for match in matches:
+            add_span(match.label, match.start, match.end, priorities[match.label])
+
+        for method in masking_order:
+            if method != "NER" and method in self.mapping:
+                if not isinstance(methods[method], re.Pattern):
+                    with self._timed("detect:" + method):
+                        found = methods[method](text)  # type: ignore
+                    if self._stats is not None:
+                        self._stats.add_entities(method, len(found))
+                    add_aliases(method, found, priorities[method])
+                add_aliases(
+                    method, current_individuals.get(method, set()), priorities[method]
+                )
+            elif method == "NER":
+                persons = 0
+                for span in ner_spans:
+                    if span.label in self._supported_NE and span.label in self.mapping:
+                        add_span(span.label, span.start, span.end, priorities[method])
+                        persons += span.label == "PER"
+                for ent_name in self._supported_NE:
+                    if ent_name in self.mapping:
+                        individual_entities = current_individuals.get(ent_name, set())
+                        add_aliases(ent_name, individual_entities, priorities[method])
+                        if ent_name == "PER":
+                            persons += len(individual_entities)
+
+                if persons == 0:
+                    logging.warning(
+                        f"No person found in text at index {index} of text corpus"
+                    )
+
+        if self._stats is not None:
+            # distinct entities, as counted when masking by string search
+            found_entities = {(x.label, x.text) for x in matches}
+            found_entities.update(
+                (x.label, x.text)
+                for x in ner_spans
+                if x.label in self._supported_NE and x.label in self.mapping
+            )
+            for ent_type, _ in found_entities:
+                self._stats.add_entities(ent_type, 1)
+        with self._timed("masking"):
+            return self._splice_masks(text, spans, aliases, index)
+
+    def _ner_spans(
+        self,
+        batch_size: int,
+        n_process: int,
+        texts: List[str],
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+    ) -> List[List[EntitySpan]]:
+        """
+        Runs DaCy NER model on texts in batch mode, returning compact entity spans.
+        Long texts are split into overlapping windows which are predicted independently,
+        and texts found in the NER cache are not predicted again
 
         Args:
             batch_size: Number of texts to include in a batch
             n_process: Number of CPU cores to split computational on
+            texts: Texts to run the model on
+            max_batch_tokens: Batch texts of similar length up to this many padded tokens instead of by count
+            max_chunk_tokens: Split texts longer than this many tokens into windows
+            chunk_overlap: Number of tokens shared by consecutive windows
 
         Returns:
-            None
+            A list of entity spans for each text
 
         """
+        if self.ner_cache is None:
+            return self._chunked_ner(
+                batch_size,
+                n_process,
+                texts,
+                max_batch_tokens,
+                max_chunk_tokens,
+                chunk_overlap,
+            )
 
-        if device != "cuda" and platform != "win32":
-            # processes = n_process if n_process < len(self.corpus) else len(self.corpus)
-            batches = (
-                self.corpus[pos : pos + batch_size]
-                for pos in range(0, len(self.corpus), batch_size)
+        settings = (
+            f"{model_id(self.model_size)}|chunks={max_chunk_tokens}/{chunk_overlap}"
+        )
+        keys = [
+            self.ner_cache.key(text, settings, self._supported_NE) for text in texts
+        ]
+        spans = [self.ner_cache.get(key) for key in keys]
+
+        # identical texts which are not cached are only predicted once
+        missing: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if spans[i] is None and key not in missing:
+                missing[key] = i
+
+        if missing:
+            predicted = self._chunked_ner(
+                batch_size,
+                n_process,
+                [texts[i] for i in missing.values()],
+                max_batch_tokens,
+                max_chunk_tokens,
+                chunk_overlap,
             )
-            with multiprocessing.Pool(n_process) as p:
-                results = p.map(worker, batches)
+            found = dict(zip(missing, predicted))
+            self.ner_cache.put_many(list(found.items()))
+            spans = [found[key] if x is None else x for key, x in zip(keys, spans)]
 
-            results = [item for sublist in results for item in sublist]
-        else:
-            torch.set_num_threads(n_process)
-            results = ner_model.pipe(self.corpus, batch_size=batch_size)
+        return spans  # type: ignore
 
-        entities: List[Dict[str, Set[str]]] = list()
+    def _chunked_ner(
+        self,
+        batch_size: int,
+        n_process: int,
+        texts: List[str],
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+    ) -> List[List[EntitySpan]]:
+        """
+        Runs DaCy NER model on texts, splitting long texts into overlapping windows
+
+        Args:
+            batch_size: Number of texts to include in a batch
+            n_process: Number of CPU cores to split computational on
+            texts: Texts to run the model on
+            max_batch_tokens: Batch texts of similar length up to this many padded tokens instead of by count
+            max_chunk_tokens: Split texts longer than this many tokens into windows
+            chunk_overlap: Number of tokens shared by consecutive windows
 
-        for i, doc in enumerate(results):
+        Returns:
+            A list of entity spans for each text
+
+        """
+        if not max_chunk_tokens:
+            return self._run_ner(batch_size, n_process, texts, max_batch_tokens)
+
+        units: List[Tuple[int, int, str]] = [
+            (i, offset, chunk)
+            for i, text in enumerate(texts)
+            for offset, chunk in split_text(text, max_chunk_tokens, chunk_overlap)
+        ]
+        unit_spans = self._run_ner(
+            batch_size, n_process, [chunk for _, _, chunk in units], max_batch_tokens
+        )
+
+        chunk_spans: List[List[Tuple[int, List[EntitySpan]]]] = [[] for _ in texts]
+        for (i, offset, _), spans in zip(units, unit_spans):
+            chunk_spans[i].append((offset, spans))
+        return [
+            merge_chunk_spans(chunks, len(text))
+            for chunks, text in zip(chunk_spans, texts)
+        ]
+
+    def _run_ner(
+        self,
+        batch_size: int,
+        n_process: int,
+        texts: List[str],
+        max_batch_tokens: int = None,
+    ) -> List[List[EntitySpan]]:
+        """
+        Runs DaCy NER model on texts in batch mode on the executor, a temporary pool or the GPU
+
+        Args:
+            batch_size: Number of texts to include in a batch
+            n_process: Number of CPU cores to split computational on
+            texts: Texts to run the model on
+            max_batch_tokens: Batch texts of similar length up to this many padded tokens instead of by count
+
+        Returns:
+            A list of entity spans for each text
+
+        """
+        with_numbers = "NUM" in self.mapping
+
+        if self.executor is not None:
+            if self.executor.model_size != self.model_size:
+                raise ValueError(
+                    f"NERExecutor runs the {self.executor.model_size} model, "
+                    f"but the {self.model_size} model was requested"
+                )
+            return self.executor.predict(
+                texts, batch_size, with_numbers, max_batch_tokens
+            )
+
+        ner_model = self.ner_model
+        if get_device() != "cuda" and platform != "win32":
+            # processes = n_process if n_process < len(texts) else len(texts)
+            with NERExecutor(self.model_size, n_process) as executor:
+                return executor.predict(
+                    texts, batch_size, with_numbers, max_batch_tokens
+                )
+
+        import torch
+
+        torch.set_num_threads(n_process)
+        spans: List[List[EntitySpan]] = [[] for _ in texts]
+        for group in batch_indices(texts, batch_size, max_batch_tokens):
+            docs = ner_model.pipe([texts[i] for i in group], batch_size=len(group))
+            for i, doc in zip(group, docs):
+                spans[i] = compact_doc(doc, with_numbers)
+        return spans
+
+    def _batch_prediction_DaCy(
+        self,
+        batch_size: int,
+        n_process: int,
+        texts: List[str] = None,
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+    ) -> List[Dict[str, Set[str]]]:
+        """
+        Runs DaCy NER model on full corpus in batch mode and masks entities
+
+        Args:
+            batch_size: Number of texts to include in a batch
+            n_process: Number of CPU cores to split computational on
+            texts: Texts to run the model on (default is the full corpus)
+            max_batch_tokens: Batch texts of similar length up to this many padded tokens instead of by count
+            max_chunk_tokens: Split texts longer than this many tokens into windows
+            chunk_overlap: Number of tokens shared by consecutive windows
+
+        Returns:
+            A list of dictionaries with the named entities found in each text
+
+        """
+        texts = self.corpus if texts is None else texts
+        results = self._ner_spans(
+            batch_size,
+            n_process,
+            texts,
+            max_batch_tokens,
+            max_chunk_tokens,
+            chunk_overlap,
+        )
+
+        entities: List[Dict[str, Set[str]]] = list()
+        for spans in results:
             text_entities: Dict[str, Set[str]] = {
                 x: set([]) for x in self._supported_NE
             }
-            for ent in doc.ents:
-                if ent.label_ in text_entities:
-                    text_entities[ent.label_].add(ent.text)
-
-            if "NUM" in self.mapping:
-                # get numbers from part of speech tags
-                for token in doc:
-                    # ensure the number isn't in another NER token
-                    digits = len([x for x in token.text if x.isdigit()])
-                    if token.tag_ == "NUM" and not token.ent_type_ and digits > 0:
-                        text_entities["NUM"].add(token.text)
+            for span in spans:
+                if span.label in text_entities:
+                    text_entities[span.label].add(span.text)
 
             entities.append(text_entities)
 
         return entities
 
-    """
-    ########## Mask multiple types of entities ##########
-    """
+    def _mask_text(
+        self,
+        text: str,
+        methods: Dict[str, Union[Callable, Pattern]],
+        masking_order: List[str],
+        ner_entities: Union[Dict[str, Set[str]], List[EntitySpan]],
+        index: int,
+    ) -> str:
+        """
+        Masks a text, replacing it with the error message if masking fails
 
-    def mask_corpus(
+        Args:
+            text: Text to mask entities from
+            methods: A dictionary of masking methods to apply
+            masking_order: The order of applying masking functions
+            ner_entities: A dictionary of sets containing the named entities found with DaCy,
+                          or a list of their spans to mask by offsets
+            index: Index of the text's placement in corpus
+
+        Returns:
+            The masked text or an error message
+
+        """
+        try:
+            if isinstance(ner_entities, list):
+                return self._apply_offset_masks(
+                    text, methods, masking_order, ner_entities, index
+                )
+            return self._apply_masks(text, methods, masking_order, ner_entities, index)
+        except Exception as e:
+            message = (
+                f"Text at index {index} in corpus failed to be transformed "
+                f"with error: {str(e)}"
+            )
+            logging.critical(message)
+            return message
+
+    def _shares_state(self) -> bool:
+        """
+        Whether masking a text depends on the texts masked before it, which rules out parallel masking
+
+        Returns:
+            False, as texts are anonymized independently
+
+        """
+        return False
+
+    def _masking_state(self, index: int) -> object:
+        """
+        State changed by masking the text at an index, sent back from masking workers
+
+        Args:
+            index: Index of the text's placement in corpus
+
+        Returns:
+            None as anonymization does not change any state
+
+        """
+        return None
+
+    def _restore_masking_state(self, index: int, state: object) -> None:
+        """
+        Restores the state of masking the text at an index in a masking worker
+
+        Args:
+            index: Index of the text's placement in corpus
+            state: State returned by _masking_state in the worker
+
+        Returns:
+            None
+
+        """
+        pass
+
+    def _forget_masking_state(self, index: int) -> None:
+        """
+        Drops the state of masking the text at an index, so streams do not grow it
+
+        Args:
+            index: Index of the text's placement in corpus
+
+        Returns:
+            None
+
+        """
+        pass
+
+    def _checkpoint_settings(
+        self, masking_order: List[str], offset_masking: bool
+    ) -> Dict[str, object]:
+        """
+        Settings changing the masked texts, which must match when resuming a checkpointed job
+
+        Args:
+            masking_order: The order of applying masking functions
+            offset_masking: Whether entities are masked at their offsets
+
+        Returns:
+            A JSON serializable dictionary of the settings
+
+        """
+        return {
+            "masker": type(self).__name__,
+            "masking_order": masking_order,
+            "mapping": self.mapping,
+            "model": model_id(self.model_size) if "NER" in masking_order else None,
+            "epsilon": self.epsilon,
+            "seed": self.seed,
+            "offset_masking": offset_masking,
+        }
+
+    def _save_checkpoint_state(self, checkpoint: CorpusCheckpoint) -> None:
+        """
+        Writes state shared between texts to a checkpoint before a batch is marked done
+
+        Args:
+            checkpoint: The checkpoint of the job
+
+        Returns:
+            None
+
+        """
+        pass
+
+    def _load_checkpoint_state(self, checkpoint: CorpusCheckpoint) -> None:
+        """
+        Restores state shared between texts from a checkpoint when resuming a job
+
+        Args:
+            checkpoint: The checkpoint of the job
+
+        Returns:
+            None
+
+        """
+        pass
+
+    def _mask_checkpointed(
         self,
-        masking_order: List[str] = ["CPR", "TELEFON", "EMAIL", "NER"],
-        custom_functions: Dict[str, Callable] = {},
-        batch_size: int = 8,
-        n_process: int = num_cpus,
-        logging_file: str = None,
-        loglevel: str = "DEBUG",
+        checkpoint: CorpusCheckpoint,
+        methods: Dict[str, Union[Callable, Pattern]],
+        masking_order: List[str],
+        batch_size: int,
+        n_process: int,
+        parallel_masking: bool = False,
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+        offset_masking: bool = False,
+        stats: MaskingStats = None,
     ) -> List[str]:
         """
-        Mask a corpus of danish text with provided methods
+        Masks the corpus one checkpointed batch at a time, reading the batches already
+        written to the checkpoint instead of masking them again
 
         Args:
+            checkpoint: The checkpoint of the job
+            methods: A dictionary of masking methods to apply
+            masking_order: The order of applying masking functions
+            batch_size: Used for DaCy running in batch mode
+            n_process: Number of CPU cores to split computational on
+            parallel_masking: Whether to mask texts in n_process worker processes
+            max_batch_tokens: Batch texts of similar length up to this many padded tokens instead of by count
+            max_chunk_tokens: Split texts longer than this many tokens into windows for DaCy
+            chunk_overlap: Number of tokens shared by consecutive windows
+            offset_masking: Whether to mask entities at their offsets
+            stats: A MaskingStats collecting the time spent in each stage
+
+        Returns:
+            The masked corpus
+
+        """
+        self._load_checkpoint_state(checkpoint)
+        masked_corpus: List[str] = []
+        resumed = 0
+        for start, end in checkpoint.ranges():
+            texts = self.corpus[start:end]
+            done = checkpoint.load(start, end, texts)
+            if done is not None:
+                masked, states = done
+                for index, state in states.items():
+                    self._restore_masking_state(index, state)
+                masked_corpus.extend(masked)
+                resumed += 1
+                continue
+
+            masked = list(
+                self._mask_chunks(
+                    list(enumerate(texts, start)),
+                    methods,
+                    masking_order,
+                    batch_size,
+                    n_process,
+                    len(texts),
+                    parallel_masking,
+                    max_batch_tokens,
+                    max_chunk_tokens,
+                    chunk_overlap,
+                    offset_masking,
+                    stats,
+                )
+            )
+            self._save_checkpoint_state(checkpoint)
+            checkpoint.save(
+                start,
+                end,
+                texts,
+                masked,
+                {index: self._masking_state(index) for index in range(start, end)},
+            )
+            masked_corpus.extend(masked)
+            logging.info(f"Checkpointed texts {start} to {end}")
+
+        if resumed:
+            logging.info(f"Resumed {resumed} batches from {checkpoint.directory}")
+        return masked_corpus
+
+    def _parallel_masking(
+        self,
+        pool: multiprocessing.pool.Pool,
+        items: List[Tuple[int, str, Union[Dict[str, Set[str]], List[EntitySpan]]]],
+        n_process: int,
+    ) -> Iterator[str]:
+        """
+        Masks texts across a pool of forked masking workers, keeping the input order
+
+        Args:
+            pool: Pool of workers forked with the masking context set
+            items: List of text indices, texts and named entities
+            n_process: Number of worker processes
+
+        Returns:
+            An iterator of masked texts
+
+        """
+        # a few tasks per worker evens out texts of different lengths
+        size = max(len(items) // (n_process * 4), 1)
+        tasks = [items[pos : pos + size] for pos in range(0, len(items), size)]
+        for results in pool.imap(masking_worker, tasks):
+            for index, text, state in results:
+                self._restore_masking_state(index, state)
+                yield text
+
+    def _setup(
+        self,
+        texts_info: str,
+        masking_order: List[str],
+        custom_functions: Dict[str, Union[Callable, Pattern]],
+        batch_size: int,
+        n_process: int,
+        logging_file: Optional[str],
+        loglevel: str,
+    ) -> Dict[str, Union[Callable, Pattern]]:
+        """
+        Configures logging, logs the settings and collects the masking methods
+
+        Args:
+            texts_info: Description of the number of texts to mask
             masking_order: Directed list of masking methods to apply to the corpus
-            custom_functions: Dictionary containing custom masking functions as values and their names as keys
+            custom_functions: Dictionary containing custom masking functions or compiled regex detectors
             batch_size: Used for DaCy running in batch mode
             n_process: Number of CPU cores to split computational on
             logging_file: Save log to file
-            loglevel: Logging level to include in logging (default debug: include all)
+            loglevel: Logging level to include in logging
 
         Returns:
-            Anonymized version of the corpus
+            A dictionary of all masking methods
 
         """
         log_level = getattr(logging, loglevel.upper(), None)
@@ -407,18 +1148,13 @@ class TextAnonymizer(object):
                 level=log_level,
             )
         logging.info("##### General settings #####")
-        logging.info(f"Texts within corpus: {len(self.corpus)}")
+        logging.info(f"Texts within corpus: {texts_info}")
         logging.info(f"Batch size for DaCy: {batch_size}")
         logging.info(f"Number of processes: {n_process}")
         logging.info(f"Numerical Laplace epsilon: {self.epsilon}")
         logging.info(f"Suppression: {self.suppression}")
 
-        methods = {
-            "CPR": self.find_cpr,
-            "TELEFON": self.find_telefon_nr,
-            "EMAIL": self.find_email,
-        }
-
+        methods: Dict[str, Union[Callable, Pattern]] = dict(DETECTORS)
         methods.update(custom_functions)
 
         entities_masked = [x for x in masking_order if x != "NER"]
@@ -426,27 +1162,505 @@ class TextAnonymizer(object):
             entities_masked = entities_masked + self._supported_NE
 
         logging.info("Entities: {}".format(",".join(entities_masked)))
+        return methods
 
-        logging.info("##### Starting masking corpus #####")
-        if "NER" in masking_order:
-            logging.info("Running DaCy Named Entity Recognition...")
-            entities = self._batch_prediction_DaCy(batch_size, n_process)
-            logging.info("Finished DaCy...")
-        else:
-            entities = [{} for x in self.corpus]
+    def _mask_chunks(
+        self,
+        texts: Iterable[Union[str, Tuple[int, str]]],
+        methods: Dict[str, Union[Callable, Pattern]],
+        masking_order: List[str],
+        batch_size: int,
+        n_process: int,
+        chunk_size: int,
+        parallel_masking: bool = False,
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+        offset_masking: bool = False,
+        stats: MaskingStats = None,
+        retain_state: bool = True,
+    ) -> Iterator[str]:
+        """
+        Pulls texts in chunks, runs DaCy on each chunk and yields the masked texts in order
 
-        self.transformed_corpus = []
-        logging.info("Starting masking...")
-        for i, text in enumerate(self.corpus):
-            try:
-                text = self._apply_masks(text, methods, masking_order, entities[i], i)
-            except Exception as e:
-                logging.critical(
-                    f"Text at index {i} in corpus failed to be transformed with error: {str(e)}"
+        Args:
+            texts: Iterable of texts or (index, text) pairs
+            methods: A dictionary of masking methods to apply
+            masking_order: The order of applying masking functions
+            batch_size: Used for DaCy running in batch mode
+            n_process: Number of CPU cores to split computational on
+            chunk_size: Number of texts to hold in memory at a time
+            parallel_masking: Whether to mask texts in n_process worker processes
+            max_batch_tokens: Batch texts of similar length up to this many padded tokens instead of by count
+            max_chunk_tokens: Split texts longer than this many tokens into windows for DaCy
+            chunk_overlap: Number of tokens shared by consecutive windows
+            offset_masking: Mask the entities at the offsets where DaCy and the regex detectors found them instead of searching the text for them
+            stats: A MaskingStats collecting the time spent in each stage and per text
+            retain_state: Whether to keep the state of texts without preset individuals after their chunk
+
+        Returns:
+            An iterator of masked texts
+
+        """
+        if (
+            parallel_masking
+            and n_process > 1
+            and multiprocessing.get_start_method() != "fork"
+        ):
+            logging.warning("Parallel masking requires fork, masking sequentially")
+            parallel_masking = False
+        if parallel_masking and self._shares_state():
+            logging.warning(
+                "Masking depends on state shared between texts, masking sequentially"
+            )
+            parallel_masking = False
+
+        items = iter(texts)
+        position = 0
+        pool = None
+        if stats is not None:
+            stats.start()
+            self._stats = stats
+        try:
+            while True:
+                chunk = list(islice(items, chunk_size))
+                if not chunk:
+                    return
+
+                indices: List[int] = []
+                chunk_texts: List[str] = []
+                for item in chunk:
+                    index, text = (position, item) if isinstance(item, str) else item
+                    indices.append(index)
+                    chunk_texts.append(text)
+                    position += 1
+                # state of texts without preset individuals is dropped after the chunk
+                transient = (
+                    []
+                    if retain_state
+                    else [x for x in indices if self._masking_state(x) is None]
                 )
-                text = f"Text at index {i} in corpus failed to be transformed with error: {str(e)}"
 
-            self.transformed_corpus.append(text)
+                entities: List[Union[Dict[str, Set[str]], List[EntitySpan]]]
+                if "NER" in masking_order:
+                    logging.info("Running DaCy Named Entity Recognition...")
+                    predict = self._batch_prediction_DaCy
+                    if offset_masking:
+                        predict = self._ner_spans  # type: ignore
+                    with self._timed("ner"):
+                        entities = predict(  # type: ignore
+                            batch_size,
+                            n_process,
+                            chunk_texts,
+                            max_batch_tokens,
+                            max_chunk_tokens,
+                            chunk_overlap,
+                        )
+                    logging.info("Finished DaCy...")
+                else:
+                    entities = [[] if offset_masking else {} for x in chunk_texts]
+
+                logging.info("Starting masking...")
+                if parallel_masking and n_process > 1 and len(chunk_texts) > 1:
+                    if pool is None:
+                        # fork after DaCy so that the workers share the loaded model
+                        _masking_context.update(
+                            anonymizer=self,
+                            methods=methods,
+                            masking_order=masking_order,
+                        )
+                        pool = multiprocessing.Pool(n_process)
+                    yield from self._parallel_masking(
+                        pool, list(zip(indices, chunk_texts, entities)), n_process
+                    )
+                    if stats is not None:
+                        # stages of texts masked in worker processes are not timed
+                        for index, text in zip(indices, chunk_texts):
+                            stats.on_document(index, text)
+                else:
+                    for index, text, text_entities in zip(
+                        indices, chunk_texts, entities
+                    ):
+                        if stats is None:
+                            yield self._mask_text(
+                                text, methods, masking_order, text_entities, index
+                            )
+                            continue
+                        tic = time.perf_counter()
+                        masked = self._mask_text(
+                            text, methods, masking_order, text_entities, index
+                        )
+                        stats.on_document(index, text, time.perf_counter() - tic)
+                        yield masked
+
+                for index in transient:
+                    self._forget_masking_state(index)
+        finally:
+            if stats is not None:
+                stats.stop()
+                self._stats = None
+            if pool is not None:
+                pool.close()
+                pool.join()
+                _masking_context.clear()
+
+    """
+    ########## Mask multiple types of entities ##########
+    """
+
+    def mask_corpus(
+        self,
+        masking_order: List[str] = ["CPR", "TELEFON", "EMAIL", "NER"],
+        custom_functions: Dict[str, Union[Callable, Pattern]] = {},
+        batch_size: int = 8,
+        n_process: int = num_cpus,
+        logging_file: str = None,
+        loglevel: str = "DEBUG",
+        parallel_masking: bool = False,
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+        offset_masking: bool = False,
+        checkpoint_dir: str = None,
+        checkpoint_size: int = 1000,
+        stats: MaskingStats = None,
+    ) -> List[str]:
+        """
+        Mask a corpus of danish text with provided methods
+
+        Args:
+            masking_order: Directed list of masking methods to apply to the corpus
+            custom_functions: Dictionary containing custom masking functions or compiled regex detectors as values and their names as keys
+            batch_size: Used for DaCy running in batch mode
+            n_process: Number of CPU cores to split computational on
+            logging_file: Save log to file
+            loglevel: Logging level to include in logging (default debug: include all)
+            parallel_masking: Mask the texts after DaCy in n_process worker processes (requires fork)
+            max_batch_tokens: Batch texts of similar length for DaCy, capping each batch by its padded number of tokens instead of batch_size
+            max_chunk_tokens: Split texts longer than this many tokens into overlapping windows which DaCy predicts independently
+            chunk_overlap: Number of tokens shared by consecutive windows
+            offset_masking: Mask the entities at the offsets where DaCy and the regex detectors found them instead of searching the text for them
+            checkpoint_dir: Write each completed batch of texts to this directory, and skip the batches found there when a job is restarted
+            checkpoint_size: Number of texts in each checkpointed batch
+            stats: A MaskingStats collecting the time spent in each stage, throughput, entity counts and the slowest documents
+
+        Returns:
+            Anonymized version of the corpus
+
+        """
+        methods = self._setup(
+            str(len(self.corpus)),
+            masking_order,
+            custom_functions,
+            batch_size,
+            n_process,
+            logging_file,
+            loglevel,
+        )
+
+        logging.info("##### Starting masking corpus #####")
+        if checkpoint_dir is not None:
+            checkpoint = CorpusCheckpoint(
+                checkpoint_dir,
+                len(self.corpus),
+                checkpoint_size,
+                self._checkpoint_settings(masking_order, offset_masking),
+            )
+            self.transformed_corpus = self._mask_checkpointed(
+                checkpoint,
+                methods,
+                masking_order,
+                batch_size,
+                n_process,
+                parallel_masking,
+                max_batch_tokens,
+                max_chunk_tokens,
+                chunk_overlap,
+                offset_masking,
+                stats,
+            )
+            logging.info("##### Completed masking! #####")
+            return self.transformed_corpus
+
+        self.transformed_corpus = list(
+            self._mask_chunks(
+                self.corpus,
+                methods,
+                masking_order,
+                batch_size,
+                n_process,
+                max(len(self.corpus), 1),
+                parallel_masking,
+                max_batch_tokens,
+                max_chunk_tokens,
+                chunk_overlap,
+                offset_masking,
+                stats,
+            )
+        )
 
         logging.info("##### Completed masking! #####")
         return self.transformed_corpus
+
+    def mask_stream(
+        self,
+        texts: Iterable[Union[str, Tuple[int, str]]],
+        masking_order: List[str] = ["CPR", "TELEFON", "EMAIL", "NER"],
+        custom_functions: Dict[str, Union[Callable, Pattern]] = {},
+        batch_size: int = 8,
+        n_process: int = num_cpus,
+        chunk_size: int = None,
+        logging_file: str = None,
+        loglevel: str = "DEBUG",
+        parallel_masking: bool = False,
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+        offset_masking: bool = False,
+        stats: MaskingStats = None,
+        retain_individuals: bool = False,
+    ) -> Iterator[str]:
+        """
+        Lazily mask a stream of danish texts, holding only one chunk of texts in memory at a time
+
+        Args:
+            texts: Iterable of texts, or of (index, text) pairs to match the indices used in individuals.
+                   Plain texts are indexed by their position in the stream
+            masking_order: Directed list of masking methods to apply to the corpus
+            custom_functions: Dictionary containing custom masking functions or compiled regex detectors as values and their names as keys
+            batch_size: Used for DaCy running in batch mode
+            n_process: Number of CPU cores to split computational on
+            chunk_size: Number of texts pulled from the stream at a time (default is batch_size * n_process)
+            logging_file: Save log to file
+            loglevel: Logging level to include in logging (default debug: include all)
+            parallel_masking: Mask the texts after DaCy in n_process worker processes (requires fork)
+            max_batch_tokens: Batch texts of similar length for DaCy, capping each batch by its padded number of tokens instead of batch_size
+            max_chunk_tokens: Split texts longer than this many tokens into overlapping windows which DaCy predicts independently
+            chunk_overlap: Number of tokens shared by consecutive windows
+            offset_masking: Mask the entities at the offsets where DaCy and the regex detectors found them instead of searching the text for them
+            stats: A MaskingStats collecting the time spent in each stage, throughput, entity counts and the slowest documents
+            retain_individuals: Keep the individuals found in every streamed text, otherwise only preset individuals are kept so memory stays bounded
+
+        Returns:
+            An iterator of the masked texts in the order of the input
+
+        """
+        chunk_size = chunk_size or batch_size * n_process
+        methods = self._setup(
+            "streamed",
+            masking_order,
+            custom_functions,
+            batch_size,
+            n_process,
+            logging_file,
+            loglevel,
+        )
+
+        logging.info("##### Starting masking stream #####")
+        yield from self._mask_chunks(
+            texts,
+            methods,
+            masking_order,
+            batch_size,
+            n_process,
+            chunk_size,
+            parallel_masking,
+            max_batch_tokens,
+            max_chunk_tokens,
+            chunk_overlap,
+            offset_masking,
+            stats,
+            retain_individuals,
+        )
+        logging.info("##### Completed masking! #####")
+
+    async def amask_stream(
+        self,
+        texts: Union[
+            Iterable[Union[str, Tuple[int, str]]],
+            AsyncIterable[Union[str, Tuple[int, str]]],
+        ],
+        masking_order: List[str] = ["CPR", "TELEFON", "EMAIL", "NER"],
+        custom_functions: Dict[str, Union[Callable, Pattern]] = {},
+        batch_size: int = 8,
+        n_process: int = num_cpus,
+        chunk_size: int = None,
+        prefetch: int = 1,
+        executor: concurrent.futures.Executor = None,
+        logging_file: str = None,
+        loglevel: str = "DEBUG",
+        parallel_masking: bool = False,
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+        offset_masking: bool = False,
+        stats: MaskingStats = None,
+        retain_individuals: bool = False,
+    ) -> AsyncIterator[str]:
+        """
+        Masks a stream of danish texts without blocking the event loop. Each chunk of texts is
+        run through DaCy and masked in an executor while the masked texts of the previous
+        chunks are consumed, and at most prefetch masked chunks are kept waiting for the
+        consumer. Closing or cancelling the iteration stops the masking after the current chunk
+
+        Args:
+            texts: Iterable or async iterable of texts, or of (index, text) pairs to match the indices used in individuals.
+                   Plain texts are indexed by their position in the stream
+            masking_order: Directed list of masking methods to apply to the corpus
+            custom_functions: Dictionary containing custom masking functions or compiled regex detectors as values and their names as keys
+            batch_size: Used for DaCy running in batch mode
+            n_process: Number of CPU cores to split computational on
+            chunk_size: Number of texts masked at a time (default is batch_size * n_process)
+            prefetch: Number of masked chunks to keep ready ahead of the consumer
+            executor: Executor to mask the chunks in (default is the event loop's default executor)
+            logging_file: Save log to file
+            loglevel: Logging level to include in logging (default debug: include all)
+            parallel_masking: Mask the texts after DaCy in n_process worker processes (requires fork)
+            max_batch_tokens: Batch texts of similar length for DaCy, capping each batch by its padded number of tokens instead of batch_size
+            max_chunk_tokens: Split texts longer than this many tokens into overlapping windows which DaCy predicts independently
+            chunk_overlap: Number of tokens shared by consecutive windows
+            offset_masking: Mask the entities at the offsets where DaCy and the regex detectors found them instead of searching the text for them
+            stats: A MaskingStats collecting the time spent in each stage, throughput, entity counts and the slowest documents
+            retain_individuals: Keep the individuals found in every streamed text, otherwise only preset individuals are kept so memory stays bounded
+
+        Returns:
+            An async iterator of the masked texts in the order of the input
+
+        """
+        chunk_size = chunk_size or batch_size * n_process
+        methods = self._setup(
+            "streamed",
+            masking_order,
+            custom_functions,
+            batch_size,
+            n_process,
+            logging_file,
+            loglevel,
+        )
+        loop = asyncio.get_running_loop()
+        masked_chunks: "asyncio.Queue[Union[List[str], Exception, None]]" = (
+            asyncio.Queue(maxsize=max(prefetch, 1))
+        )
+
+        def mask_chunk(chunk: List[Tuple[int, str]]) -> List[str]:
+            return list(
+                self._mask_chunks(
+                    chunk,
+                    methods,
+                    masking_order,
+                    batch_size,
+                    n_process,
+                    len(chunk),
+                    parallel_masking,
+                    max_batch_tokens,
+                    max_chunk_tokens,
+                    chunk_overlap,
+                    offset_masking,
+                    stats,
+                    retain_individuals,
+                )
+            )
+
+        async def produce() -> None:
+            try:
+                position = 0
+                chunk: List[Tuple[int, str]] = []
+                async for item in _aiterate(texts):
+                    chunk.append((position, item) if isinstance(item, str) else item)
+                    position += 1
+                    if len(chunk) == chunk_size:
+                        await masked_chunks.put(
+                            await loop.run_in_executor(executor, mask_chunk, chunk)
+                        )
+                        chunk = []
+                if chunk:
+                    await masked_chunks.put(
+                        await loop.run_in_executor(executor, mask_chunk, chunk)
+                    )
+                await masked_chunks.put(None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                await masked_chunks.put(error)
+
+        logging.info("##### Starting async masking stream #####")
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                masked = await masked_chunks.get()
+                if masked is None:
+                    break
+                if isinstance(masked, Exception):
+                    raise masked
+                for text in masked:
+                    yield text
+        finally:
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+        logging.info("##### Completed masking! #####")
+
+    async def amask_corpus(
+        self,
+        masking_order: List[str] = ["CPR", "TELEFON", "EMAIL", "NER"],
+        custom_functions: Dict[str, Union[Callable, Pattern]] = {},
+        batch_size: int = 8,
+        n_process: int = num_cpus,
+        chunk_size: int = None,
+        executor: concurrent.futures.Executor = None,
+        logging_file: str = None,
+        loglevel: str = "DEBUG",
+        parallel_masking: bool = False,
+        max_batch_tokens: int = None,
+        max_chunk_tokens: int = None,
+        chunk_overlap: int = 32,
+        offset_masking: bool = False,
+        stats: MaskingStats = None,
+    ) -> List[str]:
+        """
+        Masks the corpus without blocking the event loop, see amask_stream
+
+        Args:
+            masking_order: Directed list of masking methods to apply to the corpus
+            custom_functions: Dictionary containing custom masking functions or compiled regex detectors as values and their names as keys
+            batch_size: Used for DaCy running in batch mode
+            n_process: Number of CPU cores to split computational on
+            chunk_size: Number of texts masked at a time (default is batch_size * n_process)
+            executor: Executor to mask the chunks in (default is the event loop's default executor)
+            logging_file: Save log to file
+            loglevel: Logging level to include in logging (default debug: include all)
+            parallel_masking: Mask the texts after DaCy in n_process worker processes (requires fork)
+            max_batch_tokens: Batch texts of similar length for DaCy, capping each batch by its padded number of tokens instead of batch_size
+            max_chunk_tokens: Split texts longer than this many tokens into overlapping windows which DaCy predicts independently
+            chunk_overlap: Number of tokens shared by consecutive windows
+            offset_masking: Mask the entities at the offsets where DaCy and the regex detectors found them instead of searching the text for them
+            stats: A MaskingStats collecting the time spent in each stage, throughput, entity counts and the slowest documents
+
+        Returns:
+            Anonymized version of the corpus
+
+        """
+        self.transformed_corpus = [
+            text
+            async for text in self.amask_stream(
+                self.corpus,
+                masking_order=masking_order,
+                custom_functions=custom_functions,
+                batch_size=batch_size,
+                n_process=n_process,
+                chunk_size=chunk_size,
+                executor=executor,
+                logging_file=logging_file,
+                loglevel=loglevel,
+                parallel_masking=parallel_masking,
+                max_batch_tokens=max_batch_tokens,
+                max_chunk_tokens=max_chunk_tokens,
+                chunk_overlap=chunk_overlap,
+                offset_masking=offset_masking,
+                stats=stats,
+                retain_individuals=True,
+            )
+        ]
+        return self.transformed_corpus
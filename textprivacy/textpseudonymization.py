@@ -1,10 +1,17 @@
 """Main module."""
 
-from typing import List, Dict, Set, Callable
+from typing import List, Dict, Set, Tuple, Callable, Union, Pattern
+from textprivacy.cache import NERCache
+from textprivacy.checkpoint import CorpusCheckpoint
+from textprivacy.executor import NERExecutor
+from textprivacy.identity import IdentityTable
 from textprivacy.textanonymization import TextAnonymizer
-from textprivacy.utils import is_valid_number, get_integer, get_float, laplace_noise
+from textprivacy.detectors import scan
+from textprivacy.utils import AliasIndex, EntitySpan
 
 import logging
+import os
+import re
 
 
 class TextPseudonymizer(TextAnonymizer):
@@ -16,6 +23,11 @@ class TextPseudonymizer(TextAnonymizer):
         mask_misc: Enable masking of miscellaneous entities (covers entities such as titles, events, religion etc.)
         individuals: Preset known individuals as a dict of dicts of dicts for specifying text index, person index and entities. For example:
                     individuals = { 100: {1: {'PER': {'Martin Jespersen', 'Martin', 'Jespersen, Martin'} } }}
+        model_size: Size of the DaCy model used for NER ("small", "medium" or "large"), loaded on first use
+        executor: A running NERExecutor to reuse across calls instead of starting new workers on every call
+        ner_cache: A NERCache to reuse the entities of texts which have been predicted before
+        seed: Seed of the random generator used for noising numbers, for reproducible results
+        identity_table: An IdentityTable numbering individuals consistently across all texts instead of per text
 
     """
 
@@ -23,14 +35,30 @@ class TextPseudonymizer(TextAnonymizer):
         self,
         corpus: List[str] = [],
         mask_misc: bool = False,
-        individuals: Dict[int, Dict[int, Dict[str, Set[str]]]] = {},
+        individuals: Dict[int, Dict[int, Dict[str, Set[str]]]] = None,
         mask_numbers: bool = False,
         epsilon: float = None,
+        model_size: str = "large",
+        executor: NERExecutor = None,
+        ner_cache: NERCache = None,
+        seed: int = None,
+        identity_table: IdentityTable = None,
     ):
-        super(TextPseudonymizer, self).__init__(corpus, mask_misc, False)
+        super(TextPseudonymizer, self).__init__(
+            corpus,
+            mask_misc,
+            False,
+            model_size=model_size,
+            executor=executor,
+            ner_cache=ner_cache,
+            seed=seed,
+        )
+        if individuals is None:
+            individuals = {}
         self.individuals = individuals  # type: ignore
         self.mask_numbers = mask_numbers
         self.epsilon = epsilon
+        self.identity_table = identity_table
         self.mapping: Dict[str, str] = {
             "PER": "Person",
             "LOC": "Lokation",
@@ -74,30 +102,53 @@ class TextPseudonymizer(TextAnonymizer):
 
         """
 
-        sorted_entities = sorted(entities, key=len, reverse=True)
         n_individals: int = 0
         if current_individuals:
             n_individals = max(current_individuals.keys())
 
-        while sorted_entities:
-            entity = sorted_entities.pop(0)
+        index = AliasIndex(
+            (alias, individual)
+            for individual, individual_entities in current_individuals.items()
+            for alias in individual_entities.get(entity_type, ())
+        )
+        # only individuals with the entity type can be paired, even without aliases
+        pairable = {
+            individual
+            for individual, individual_entities in current_individuals.items()
+            if entity_type in individual_entities
+        }
 
-            flag = False
-            for individual in current_individuals:
-                if entity_type in current_individuals[individual] and any(
-                    entity.lower() in e.lower()
-                    for e in current_individuals[individual][entity_type]
-                ):
-                    flag = True
-                    current_individuals[individual][entity_type].add(entity)
+        for entity in sorted(entities, key=len, reverse=True):
+            owners = index.find(entity) & pairable
+            for individual in owners:
+                current_individuals[individual][entity_type].add(entity)
 
-            if not flag:
+            if not owners:
                 n_individals += 1
                 current_individuals[n_individals] = {x: set() for x in self.mapping}
                 current_individuals[n_individals][entity_type].add(entity)
+                owners = {n_individals}
+                pairable.add(n_individals)
+
+            index.add(entity, owners)
 
         return current_individuals
 
+    def _count_entities(self, all_entities: Dict[str, Set[str]]) -> None:
+        """
+        Counts the entities found in a text when the run is instrumented
+
+        Args:
+            all_entities: A dictionary of all entities found in the text
+
+        Returns:
+            None
+
+        """
+        if self._stats is not None:
+            for ent_type, entities in all_entities.items():
+                self._stats.add_entities(ent_type, len(entities))
+
     def _update_individuals(
         self, all_entities: Dict[str, Set[str]], index: int
     ) -> Dict[int, Dict[str, Set[str]]]:
@@ -125,10 +176,91 @@ class TextPseudonymizer(TextAnonymizer):
 
         return current_individuals  # type: ignore
 
+    def _shares_state(self) -> bool:
+        """
+        Pseudonyms depend on the texts masked before when numbering with an identity table
+
+        Returns:
+            Whether an identity table is used
+
+        """
+        return self.identity_table is not None
+
+    def _masking_state(self, index: int) -> object:
+        """
+        Individuals identified when masking the text at an index, sent back from masking workers
+
+        Args:
+            index: Index of the text's placement in corpus
+
+        Returns:
+            The individuals of the text
+
+        """
+        return self.individuals.get(index)
+
+    def _restore_masking_state(self, index: int, state: object) -> None:
+        """
+        Restores the individuals identified in a masking worker
+
+        Args:
+            index: Index of the text's placement in corpus
+            state: Individuals returned by _masking_state in the worker
+
+        Returns:
+            None
+
+        """
+        if state is not None:
+            self.individuals[index] = state  # type: ignore
+
+    def _forget_masking_state(self, index: int) -> None:
+        """
+        Drops the individuals identified in a streamed text
+
+        Args:
+            index: Index of the text's placement in corpus
+
+        Returns:
+            None
+
+        """
+        self.individuals.pop(index, None)
+
+    def _save_checkpoint_state(self, checkpoint: CorpusCheckpoint) -> None:
+        """
+        Writes the identity table to a checkpoint, so pseudonyms stay consistent when resuming
+
+        Args:
+            checkpoint: The checkpoint of the job
+
+        Returns:
+            None
+
+        """
+        if self.identity_table is not None:
+            self.identity_table.save(checkpoint.identity_path)
+
+    def _load_checkpoint_state(self, checkpoint: CorpusCheckpoint) -> None:
+        """
+        Restores the identity table of a resumed job
+
+        Args:
+            checkpoint: The checkpoint of the job
+
+        Returns:
+            None
+
+        """
+        if self.identity_table is not None and os.path.exists(checkpoint.identity_path):
+            self.identity_table = IdentityTable.load(
+                checkpoint.identity_path, maxsize=self.identity_table.maxsize
+            )
+
     def _apply_masks(
         self,
         text: str,
-        methods: Dict[str, Callable],
+        methods: Dict[str, Union[Callable, Pattern]],
         masking_order: List[str],
         ner_entities: Dict[str, Set[str]],
         index: int,
@@ -138,7 +270,7 @@ class TextPseudonymizer(TextAnonymizer):
 
         Args:
             text: Text to mask entities from
-            methods: A dictionary of masking methods to apply
+            methods: A dictionary of masking methods to apply, either functions or compiled regex detectors
             masking_order: The order of applying masking functions
             ner_entities: A dictiornary of lists containing the named entities found with DaCy
             index: Index of the text's placement in corpus
@@ -148,52 +280,183 @@ class TextPseudonymizer(TextAnonymizer):
 
         """
         all_entities: Dict[str, Set[str]] = {}
+        with self._timed("detectors"):
+            detected = self._detect_entities(text, methods, masking_order)
         for method in masking_order:
             if method != "NER":
-                entities = methods[method](text)
+                if method in detected:
+                    entities = detected[method]
+                else:
+                    with self._timed("detect:" + method):
+                        entities = methods[method](text)  # type: ignore
                 all_entities[method] = entities
             else:
                 # Handle DaCy entities
                 all_entities.update(ner_entities)
+        self._count_entities(all_entities)
 
-        individuals = self._update_individuals(all_entities, index)
+        with self._timed("linking"):
+            individuals = self._update_individuals(all_entities, index)
+            if self.identity_table is not None:
+                individuals = self.identity_table.assign(individuals)
         self.individuals[index] = individuals  # type: ignore
-        total_people = 0
 
-        # get all entities into one list
-        masked_entities: List[List[str]] = []
+        # collect all (type, entity, suffix) triples once, in order of the individuals
+        masked_entities: Dict[Tuple[str, str, str], None] = {}
         for person in sorted(individuals):
             suffix = " {}".format(person)
             for method in masking_order:
                 if method != "NER" and method in individuals[person]:
                     for ent in individuals[person][method]:
-                        if [method, ent, suffix] not in masked_entities:
-                            masked_entities.append([method, ent, suffix])
+                        masked_entities[(method, ent, suffix)] = None
                 else:
                     for ent_ in self._supported_NE:
                         if ent_ in individuals[person]:
                             for ent in individuals[person][ent_]:
-                                if [ent_, ent, suffix] not in masked_entities:
-                                    masked_entities.append([ent_, ent, suffix])
+                                masked_entities[(ent_, ent, suffix)] = None
 
-        # run through all entities, sorted in descending order of entity size
-        masked_entities = sorted(masked_entities, key=lambda x: len(x[1]), reverse=True)
+        numbers: Dict[str, str] = {}
+        triples: List[Tuple[str, str, str]] = []
+        total_people = 0
         for method, ent, suffix in masked_entities:
             if method == "NUM" and self.epsilon:
+                numbers.setdefault(ent, suffix)
+            else:
+                triples.append((method, ent, suffix))
+                if method == "PER":
+                    total_people += 1
+
+        # mask all entities in one pass, giving priority to longer entities
+        with self._timed("masking"):
+            text = self._mask_all(text, triples)
+
+        # noise all numbers after masking, so placeholder suffixes are left untouched
+        if numbers and self.epsilon:
+            with self._timed("noise"):
                 text = self.noisy_numbers(
                     text,
-                    set([ent]),
+                    numbers,
                     self.epsilon,
-                    placeholder=self.mapping[method],
-                    suffix=suffix,
+                    placeholder=self.mapping["NUM"],
+                    rng=self._text_rng(index),
                 )
-            else:
-                text = self.mask_entities(text, set([ent]), method, suffix=suffix)
-
-                if method == "PER":
-                    total_people += 1
 
         if total_people == 0:
             logging.warning(f"No person found in text at index {index} of text corpus")
 
         return text
+
+    def _apply_offset_masks(
+        self,
+        text: str,
+        methods: Dict[str, Union[Callable, Pattern]],
+        masking_order: List[str],
+        ner_spans: List[EntitySpan],
+        index: int,
+    ) -> str:
+        """
+        Pairs the entities of a text to individuals and masks them at the offsets where
+        DaCy and the regex detectors found them. Only entities without offsets (from custom
+        functions and preset individuals) are searched for
+
+        Args:
+            text: Text to mask entities from
+            methods: A dictionary of masking methods to apply, either functions or compiled regex detectors
+            masking_order: The order of applying masking functions, which is also their priority
+            ner_spans: The entity spans found with DaCy
+            index: Index of the text's placement in corpus
+
+        Returns:
+            A text with the entities masked
+
+        """
+        priorities: Dict[str, int] = {}
+        for i, method in enumerate(masking_order):
+            priorities.setdefault(method, i)
+        ner_types = [x for x in self._supported_NE if x in self.mapping]
+
+        detectors = [
+            (method, methods[method])
+            for method in masking_order
+            if method in self.mapping and isinstance(methods.get(method), re.Pattern)
+        ]
+        with self._timed("detectors"):
+            matches = scan(text, detectors)  # type: ignore
+        found: List[Tuple[int, EntitySpan]] = [
+            (priorities[match.label], match) for match in matches
+        ]
+        if "NER" in priorities:
+            found.extend(
+                (priorities["NER"], span)
+                for span in ner_spans
+                if span.label in ner_types
+            )
+
+        all_entities: Dict[str, Set[str]] = {}
+        searched: Dict[Tuple[str, str], int] = {}
+        for method in masking_order:
+            if method == "NER":
+                for ent_type in ner_types:
+                    all_entities.setdefault(ent_type, set())
+            elif method in self.mapping:
+                all_entities.setdefault(method, set())
+                if not isinstance(methods[method], re.Pattern):
+                    with self._timed("detect:" + method):
+                        custom_entities = methods[method](text)  # type: ignore
+                    for ent in custom_entities:
+                        all_entities[method].add(ent)
+                        searched.setdefault((method, ent), priorities[method])
+        all_entities.setdefault("PER", set())
+        for _, span in found:
+            all_entities[span.label].add(span.text)
+
+        # entities of preset individuals have no offsets and are searched for
+        for preset in self.individuals.get(index, {}).values():
+            for ent_type, aliases in preset.items():  # type: ignore
+                priority = priorities.get("NER" if ent_type in ner_types else ent_type)
+                if priority is not None and ent_type in self.mapping:
+                    for ent in aliases:
+                        searched.setdefault((ent_type, ent), priority)
+
+        self._count_entities(all_entities)
+
+        with self._timed("linking"):
+            individuals = self._update_individuals(all_entities, index)
+            if self.identity_table is not None:
+                individuals = self.identity_table.assign(individuals)
+        self.individuals[index] = individuals  # type: ignore
+
+        owners: Dict[Tuple[str, str], int] = {}
+        for person in sorted(individuals):
+            for ent_type, aliases in individuals[person].items():
+                for ent in aliases:
+                    owners.setdefault((ent_type, ent), person)
+
+        def placeholder(ent_type: str, ent: str) -> str:
+            return "{} {}".format(self.mapping[ent_type], owners[(ent_type, ent)])
+
+        spans: List[Tuple[int, int, int, str, bool]] = []
+        for priority, span in found:
+            trimmed = self._trim_span(text, span.label, span.start, span.end)
+            if trimmed is not None:
+                noise = span.label == "NUM" and bool(self.epsilon)
+                spans.append(
+                    (priority, *trimmed, placeholder(span.label, span.text), noise)
+                )
+        aliases = [
+            (
+                priority,
+                ent_type,
+                ent,
+                placeholder(ent_type, ent),
+                ent_type == "NUM" and bool(self.epsilon),
+            )
+            for (ent_type, ent), priority in searched.items()
+            if (ent_type, ent) in owners
+        ]
+
+        if not any(x.get("PER") for x in individuals.values()):
+            logging.warning(f"No person found in text at index {index} of text corpus")
+
+        with self._timed("masking"):
+            return self._splice_masks(text, spans, aliases, index)
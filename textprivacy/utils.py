@@ -1,8 +1,230 @@
-from typing import Set, Union, Tuple
+from typing import Any, Set, Union, Tuple, Dict, List, Iterable
 
+from bisect import bisect_right
+import json
+import os
 import re
+import tempfile
+import heapq
 import numpy as np
 
+# characters that make an entity part of a larger word or number when adjacent to it
+WORD_CHARACTERS = "a-zæøåA-ZÆØÅ0-9"
+_word_character = re.compile(r"[{}]".format(WORD_CHARACTERS))
+
+
+class EntitySpan(object):
+    """
+    A typed entity found in a text together with its character offsets
+
+    Args:
+        label: Entity type (e.g. PER or CPR)
+        text: The entity as written in the text
+        start: Index of the first character of the entity
+        end: Index after the last character of the entity
+
+    """
+
+    __slots__ = ("label", "text", "start", "end")
+
+    def __init__(self, label: str, text: str, start: int, end: int):
+        self.label = label
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def _key(self) -> Tuple[str, str, int, int]:
+        return (self.label, self.text, self.start, self.end)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, EntitySpan) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __reduce__(self):  # type: ignore
+        # pickle as a plain tuple to keep transfers between processes small
+        return (EntitySpan, self._key())
+
+    def __repr__(self) -> str:
+        return "EntitySpan({!r}, {!r}, {}, {})".format(*self._key())
+
+
+class AliasIndex(object):
+    """
+    Case-insensitive substring index from aliases to the individuals owning them
+
+    All lowercased aliases are kept in one string separated by a null character,
+    so finding the individuals with an alias containing a query is a scan with
+    str.find followed by a binary search of the alias offsets.
+
+    Args:
+        aliases: Pairs of an alias and the individual owning it
+
+    """
+
+    def __init__(self, aliases: Iterable[Tuple[str, int]] = ()):
+        self._parts: List[str] = []
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._owners: List[Set[int]] = []
+        self._size = 0
+        self._haystack = ""
+        for alias, owner in aliases:
+            self.add(alias, {owner})
+
+    def add(self, alias: str, owners: Set[int]) -> None:
+        """
+        Adds an alias shared by a set of individuals
+
+        Args:
+            alias: The alias to index
+            owners: Individuals owning the alias
+
+        Returns:
+            None
+
+        """
+        alias = alias.lower()
+        start = self._size + 1 if self._parts else 0
+        self._parts.append(alias)
+        self._starts.append(start)
+        self._ends.append(start + len(alias))
+        self._owners.append(owners)
+        self._size = start + len(alias)
+
+    def find(self, query: str) -> Set[int]:
+        """
+        Finds the individuals with an alias containing the query, ignoring case
+
+        Args:
+            query: The entity to look up
+
+        Returns:
+            A set of the matching individuals
+
+        """
+        if not self._parts:
+            return set()
+        if len(self._haystack) != self._size:
+            self._haystack = "\x00".join(self._parts)
+
+        query = query.lower()
+        found: Set[int] = set()
+        position = self._haystack.find(query)
+        while position != -1:
+            i = bisect_right(self._starts, position) - 1
+            if position + len(query) <= self._ends[i]:
+                found.update(self._owners[i])
+                # the rest of this alias cannot add new owners
+                position = self._ends[i] + 1
+            else:
+                position += 1
+            if position > self._size:
+                break
+            position = self._haystack.find(query, position)
+        return found
+
+
+def token_batches(texts: List[str], max_tokens: int) -> List[List[int]]:
+    """
+    Groups texts of similar length into batches capped by their number of tokens
+    when padded to the longest text of the batch
+
+    Args:
+        texts: Texts to group into batches
+        max_tokens: Maximum number of padded tokens in a batch. Longer texts get a batch of their own
+
+    Returns:
+        A list of batches of text indices, starting with the longest texts
+
+    """
+    # whitespace tokens are a cheap estimate of the length seen by the model
+    lengths = [len(text.split()) + 1 for text in texts]
+    order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for i in order:
+        # the first text of a batch is its longest
+        if batch and (len(batch) + 1) * lengths[batch[0]] > max_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def split_text(text: str, max_tokens: int, overlap: int = 0) -> List[Tuple[int, str]]:
+    """
+    Splits a long text into overlapping windows of whitespace tokens, preferring
+    to end each window at a sentence boundary
+
+    Args:
+        text: Text to split
+        max_tokens: Maximum number of tokens in a window
+        overlap: Number of tokens shared by consecutive windows
+
+    Returns:
+        A list of windows as (character offset, window text)
+
+    """
+    tokens = [m.span() for m in re.finditer(r"\S+", text)]
+    if len(tokens) <= max_tokens:
+        return [(0, text)]
+
+    overlap = min(overlap, max_tokens // 2)
+    chunks: List[Tuple[int, str]] = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, len(tokens))
+        if end < len(tokens):
+            # end the window after a sentence in its second half if possible
+            for i in range(end - 1, start + max_tokens // 2 - 1, -1):
+                if text[tokens[i][1] - 1] in ".!?":
+                    end = i + 1
+                    break
+
+        chunk_start, chunk_end = tokens[start][0], tokens[end - 1][1]
+        chunks.append((chunk_start, text[chunk_start:chunk_end]))
+        if end == len(tokens):
+            return chunks
+        start = max(end - overlap, start + 1)
+
+
+def merge_chunk_spans(
+    chunk_spans: List[Tuple[int, List[EntitySpan]]], length: int
+) -> List[EntitySpan]:
+    """
+    Merges the entity spans found in overlapping windows of a text. Where spans from
+    different windows overlap, the longest is kept (e.g. a name cut at the edge of a window)
+
+    Args:
+        chunk_spans: A list of window offsets and the spans found within each window
+        length: Length of the full text
+
+    Returns:
+        A sorted list of entity spans with offsets in the full text
+
+    """
+    spans = {
+        EntitySpan(span.label, span.text, span.start + offset, span.end + offset)
+        for offset, window_spans in chunk_spans
+        for span in window_spans
+    }
+
+    occupied = bytearray(length)
+    merged: List[EntitySpan] = []
+    for span in sorted(spans, key=lambda x: (x.start - x.end, x.start, x.label)):
+        if occupied.find(1, span.start, span.end) == -1:
+            occupied[span.start : span.end] = b"\x01" * (span.end - span.start)
+            merged.append(span)
+
+    merged.sort(key=lambda x: x.start)
+    return merged
+
 
 def is_valid_number(number: str) -> str:
     """
@@ -87,8 +309,79 @@ def get_float(number: str) -> Tuple[float, int, str]:
     return f_number, precision, sign
 
 
+_NON_DIGITS = re.compile(r"\D+")
+_SPECIAL_CHARACTERS = frozenset(":;!@#$%^&*()+?_=<>/")
+
+
+def _digits(part: str) -> str:
+    """
+    Keeps only the digits of a part of a number
+
+    Args:
+        part: A part of the identified number
+
+    Returns:
+        The digits of the part
+
+    """
+    digits = part.lstrip("-")
+    return digits if digits.isdecimal() else _NON_DIGITS.sub("", digits)
+
+
+def parse_number(number: str) -> Tuple[str, Union[float, int, None], int, str]:
+    """
+    Classifies and parses a number in one call, following the rules of
+    is_valid_number, get_integer and get_float for Danish and English formats
+
+    Args:
+        number: A string of the identified number
+
+    Returns:
+        A tuple of the kind ("float", "integer" or "invalid"), the value, the float precision and sign
+
+    """
+    if number.isdecimal():
+        return "integer", int(number), 0, ""
+
+    dots = number.count(".")
+    commas = number.count(",")
+    last_dot = number.rfind(".")
+    last_comma = number.rfind(",")
+
+    if dots == 1 and last_dot > last_comma:
+        point = last_dot
+        sign = "-" if number.startswith("-") else ""
+        whole = _digits(number[:point].replace(",", ""))
+    elif commas == 1 and last_comma > last_dot:
+        point = last_comma
+        # thousands separators are dropped before the sign is read
+        sign = "-" if number.lstrip(".").startswith("-") else ""
+        whole = _digits(number[:point].replace(".", ""))
+    elif (
+        (dots > 1 and commas > 1)
+        or (dots == 1 and last_comma > last_dot)
+        or (
+            commas == 1
+            and last_dot > last_comma
+            and _SPECIAL_CHARACTERS.isdisjoint(number)
+        )
+    ):
+        return "invalid", None, 0, ""
+    else:
+        digits = _digits(number.replace(".", "").replace(",", ""))
+        return "integer", int(digits), 0, ""
+
+    decimals = _digits(number[point + 1 :])
+    value = float("{}{}.{}".format(sign, whole, decimals))
+    return "float", value, len(decimals), sign
+
+
 def laplace_noise(
-    number: Union[float, int], epsilon: float, sign: str, integer: str
+    number: Union[float, int],
+    epsilon: float,
+    sign: str,
+    integer: str,
+    rng: np.random.Generator = None,
 ) -> Union[float, int]:
     """
     Adds laplace noise of (epsilon, 0) distribution
@@ -98,14 +391,240 @@ def laplace_noise(
         epsilon: Parameter used for laplace distribution (similar to differential privacy)
         sign: The sign of the number
         integer: Whether number is an integer
+        rng: Random generator to draw the noise from (default is numpy's global random state)
 
     Returns:
         Returns the float or integer with added laplace noise
 
     """
-    noise = np.random.laplace(0, 1.0 / epsilon, 1)[0]
+    if rng is None:
+        noise = np.random.laplace(0, 1.0 / epsilon, 1)[0]
+    else:
+        noise = rng.laplace(0, 1.0 / epsilon)
     noisy_number = number + noise
     noisy_number = abs(noisy_number) if not sign else noisy_number
     if integer == "integer":
         noisy_number = int(noisy_number)
     return noisy_number
+
+
+def laplace_noise_batch(
+    numbers: List[Union[float, int]],
+    epsilon: float,
+    signs: List[str],
+    kinds: List[str],
+    rng: np.random.Generator,
+) -> List[Union[float, int]]:
+    """
+    Adds laplace noise of (epsilon, 0) distribution to many numbers with one draw
+
+    Args:
+        numbers: Values of the identified numbers
+        epsilon: Parameter used for laplace distribution (similar to differential privacy)
+        signs: The sign of each number
+        kinds: Whether each number is an integer or a float
+        rng: Random generator to draw the noise from
+
+    Returns:
+        Returns the floats or integers with added laplace noise
+
+    """
+    if not numbers:
+        return []
+
+    noisy = np.asarray(numbers, dtype=float) + rng.laplace(
+        0, 1.0 / epsilon, len(numbers)
+    )
+    unsigned = np.array([not sign for sign in signs])
+    noisy = np.where(unsigned, np.abs(noisy), noisy)
+    return [
+        int(value) if kind == "integer" else value
+        for value, kind in zip(noisy.tolist(), kinds)
+    ]
+
+
+def _is_word_character(char: str) -> bool:
+    """
+    Determines whether a character can be part of a word or number
+
+    Args:
+        char: A single character
+
+    Returns:
+        Whether the character is a letter or digit
+
+    """
+    return _word_character.match(char) is not None
+
+
+# longer entities are left out of the trie, whose regex nests a group per character
+_MAX_TRIE_LENGTH = 100
+
+
+def _trie_regex(node: Dict[str, dict]) -> str:
+    """
+    Builds a regex from a character trie, preferring the longest entity at each position
+
+    Args:
+        node: Trie node where the empty key marks the end of an entity
+
+    Returns:
+        A regex matching every entity in the trie
+
+    """
+    branches = [
+        re.escape(char) + _trie_regex(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+
+    body = branches[0] if len(branches) == 1 else "(?:{})".format("|".join(branches))
+    return "(?:{})?".format(body) if "" in node else body
+
+
+def find_entity_spans(
+    text: str, replacements: Dict[str, str]
+) -> List[Tuple[int, int, str]]:
+    """
+    Finds all occurrences of entities in one scan of the text. Longer entities
+    take priority and entities within larger words or numbers are skipped
+
+    Args:
+        text: Text to find entities in
+        replacements: Dictionary of entities and the placeholder to replace them with
+
+    Returns:
+        A sorted list of non-overlapping spans as (start, end, placeholder)
+
+    """
+    ordered = sorted((x for x in replacements if x), key=lambda x: (-len(x), x))
+    if not ordered:
+        return []
+
+    # a trie shaped alternation only branches on the next character of each entity,
+    # long entities are tried first as plain alternatives as the trie nests per character
+    alternatives = [re.escape(x) for x in ordered if len(x) > _MAX_TRIE_LENGTH]
+    trie: Dict[str, dict] = {}
+    for ent in ordered:
+        if len(ent) > _MAX_TRIE_LENGTH:
+            continue
+        node = trie
+        for char in ent:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    if trie:
+        alternatives.append(_trie_regex(trie))
+    rank = {ent: i for i, ent in enumerate(ordered)}
+    pattern = re.compile(r"(?=({}))".format("|".join(alternatives)))
+    candidates = [
+        (-len(m.group(1)), m.start(), rank[m.group(1)]) for m in pattern.finditer(text)
+    ]
+    heapq.heapify(candidates)
+
+    occupied = bytearray(len(text))
+    # neighbours which are already masked are judged by their placeholder
+    first_chars: Dict[int, str] = {}
+    last_chars: Dict[int, str] = {}
+    spans: List[Tuple[int, int, str]] = []
+    while candidates:
+        neg_length, start, i = heapq.heappop(candidates)
+        end = start - neg_length
+        before = last_chars.get(start, text[start - 1] if start > 0 else "")
+        after = first_chars.get(end, text[end] if end < len(text) else "")
+        if (
+            occupied.find(1, start, end) == -1
+            and not _is_word_character(before)
+            and not _is_word_character(after)
+        ):
+            placeholder = replacements[ordered[i]]
+            occupied[start:end] = b"\x01" * (end - start)
+            if placeholder:
+                first_chars[start] = placeholder[0]
+                last_chars[end] = placeholder[-1]
+            spans.append((start, end, placeholder))
+            continue
+
+        # fall back to the longest shorter entity starting at the same position
+        for j in range(i + 1, len(ordered)):
+            if len(ordered[j]) < -neg_length and text.startswith(ordered[j], start):
+                heapq.heappush(candidates, (-len(ordered[j]), start, j))
+                break
+
+    spans.sort()
+    return spans
+
+
+def resolve_overlaps(spans: List[Tuple]) -> List[Tuple]:  # type: ignore
+    """
+    Keeps non-overlapping spans, preferring spans of higher priority and then longer spans
+
+    Args:
+        spans: Spans as (priority, start, end, ...), where a lower priority value wins
+
+    Returns:
+        The kept spans sorted by their start
+
+    """
+    starts: List[int] = []
+    ends: List[int] = []
+    kept: List[Tuple] = []  # type: ignore
+    for span in sorted(spans, key=lambda x: (x[0], x[1] - x[2], x[1])):
+        start, end = span[1], span[2]
+        i = bisect_right(starts, start)
+        if (i > 0 and ends[i - 1] > start) or (i < len(starts) and starts[i] < end):
+            continue
+        starts.insert(i, start)
+        ends.insert(i, end)
+        kept.insert(i, span)
+    return kept
+
+
+def replace_spans(text: str, spans: List[Tuple[int, int, str]]) -> str:
+    """
+    Replaces sorted, non-overlapping spans of a text in a single pass
+
+    Args:
+        text: Text to replace spans in
+        spans: A sorted list of spans as (start, end, replacement)
+
+    Returns:
+        The text with all spans replaced
+
+    """
+    if not spans:
+        return text
+
+    pieces: List[str] = []
+    position = 0
+    for start, end, replacement in spans:
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """
+    Writes JSON to a file through a temporary file, so readers never see a partial file
+
+    Args:
+        path: Path of the JSON file
+        data: JSON serializable data
+
+    Returns:
+        None
+
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise